@@ -0,0 +1,250 @@
+# audio_splitting.py
+import numpy as np
+from numba import njit
+
+from dtw_engine import _CACHE
+
+
+def frame_energy_db(audio, frame_length=400, hop_length=160, ref=None):
+    """RMS-енергія кадрів у дБ відносно найгучнішого кадру (як у librosa.effects.split).
+
+    З ref=1.0 енергія повертається в дБ повної шкали (dBFS).
+    """
+    n_frames = 1 + max(0, len(audio) - frame_length) // hop_length
+    if len(audio) == 0:
+        return np.zeros(0, dtype=np.float32)
+    # Кумулятивна сума квадратів дає енергію будь-якого кадру за O(1)
+    squares = np.concatenate(([0.0], np.cumsum(np.square(audio, dtype=np.float64))))
+    starts = np.arange(n_frames) * hop_length
+    ends = np.minimum(starts + frame_length, len(audio))
+    rms = np.sqrt((squares[ends] - squares[starts]) / frame_length)
+    if ref is None:
+        ref = max(rms.max(), 1e-10)
+    return 20.0 * np.log10(np.maximum(rms, 1e-10) / ref)
+
+
+def find_split_points(
+    audio, sr, chunk_length=120.0, search_window=10.0, hop_length=160
+):
+    """Шукає точки розрізу поблизу кожних chunk_length секунд у найтихших місцях.
+
+    Повертає список відліків, за якими аудіо можна розрізати на шматки
+    приблизно однакової тривалості, не розриваючи слова.
+    """
+    total = len(audio)
+    chunk_samples = int(chunk_length * sr)
+    if total <= chunk_samples * 1.5:
+        return []
+
+    energy = frame_energy_db(
+        audio, frame_length=hop_length * 2, hop_length=hop_length
+    )
+    # Згладжування ~0.3 с, щоб обирати паузи, а не випадкові тихі кадри
+    smooth = max(1, int(0.3 * sr / hop_length))
+    energy = np.convolve(energy, np.ones(smooth) / smooth, mode="same")
+    search = int(search_window * sr / hop_length)
+
+    points = []
+    target = chunk_samples
+    while target < total - chunk_samples // 2:
+        center = target // hop_length
+        lo = max(0, center - search)
+        hi = min(len(energy), center + search + 1)
+        if hi <= lo:
+            break
+        quietest = lo + int(np.argmin(energy[lo:hi]))
+        point = quietest * hop_length + hop_length
+        if points and point <= points[-1]:
+            point = target
+        points.append(point)
+        target = point + chunk_samples
+    return points
+
+
+def speech_regions(
+    audio,
+    sr,
+    top_db=40,
+    min_dbfs=-50,
+    min_silence=0.5,
+    padding=0.2,
+    hop_length=160,
+    ref_percentile=95,
+):
+    """Енергетичний детектор мовлення: список ділянок (start, end) у відліках.
+
+    Кадр вважається мовленням, якщо його енергія не нижча за top_db від
+    гучності файлу і водночас не нижча за min_dbfs. Гучність файлу — це
+    ref_percentile-й перцентиль енергії кадрів, а не максимум, тож один
+    гучний сплеск не відсікає тихе мовлення. Тиша чи слабкий шум не
+    проходять абсолютний поріг, і тоді повертається порожній список.
+    Паузи коротші за min_silence не розривають ділянку, а кожна ділянка
+    розширюється на padding секунд, щоб не обрізати початки та кінці слів.
+    """
+    energy = frame_energy_db(
+        audio, frame_length=hop_length * 2, hop_length=hop_length, ref=1.0
+    )
+    if not len(energy):
+        return []
+    loudness = np.percentile(energy, ref_percentile)
+    voiced = (energy > loudness - top_db) & (energy > min_dbfs)
+    if not voiced.any():
+        return []
+
+    # Межі серій кадрів мовлення
+    edges = np.flatnonzero(
+        np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+    )
+    starts, ends = edges[::2], edges[1::2]
+
+    # Об'єднуємо ділянки, розділені короткими паузами
+    long_pause = (starts[1:] - ends[:-1]) * hop_length >= min_silence * sr
+    keep = np.concatenate(([True], long_pause))
+    starts = starts[keep]
+    ends = np.concatenate((ends[:-1][keep[1:]], ends[-1:]))
+
+    pad = int(padding * sr)
+    starts = np.maximum(starts * hop_length - pad, 0)
+    ends = np.minimum(ends * hop_length + hop_length + pad, len(audio))
+    # Після розширення сусідні ділянки можуть перекриватися
+    regions = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], max(regions[-1][1], end))
+        else:
+            regions.append((start, end))
+    return regions
+
+
+class PackedTimeline:
+    """Відповідність між часом у стиснутому аудіо та вихідною шкалою часу."""
+
+    def __init__(self, packed_starts, original_starts, durations):
+        self.packed_starts = np.asarray(packed_starts, dtype=np.float64)
+        self.original_starts = np.asarray(original_starts, dtype=np.float64)
+        self.durations = np.asarray(durations, dtype=np.float64)
+
+    def to_original(self, t, is_start=False):
+        if len(self.packed_starts) == 0:
+            return t
+        idx = max(0, int(np.searchsorted(self.packed_starts, t, side="right")) - 1)
+        offset = t - self.packed_starts[idx]
+        if offset > self.durations[idx]:
+            # Момент припадає на вставлену паузу між ділянками
+            if is_start and idx + 1 < len(self.packed_starts):
+                return float(self.original_starts[idx + 1])
+            offset = self.durations[idx]
+        return float(self.original_starts[idx] + max(0.0, offset))
+
+
+def pack_regions(audio, regions, sr, gap=0.3):
+    """Склеює ділянки мовлення в одне коротше аудіо з паузами gap секунд.
+
+    Повертає (packed_audio, PackedTimeline).
+    """
+    gap_samples = np.zeros(int(gap * sr), dtype=np.float32)
+    pieces = []
+    packed_starts, original_starts, durations = [], [], []
+    position = 0
+    for start, end in regions:
+        if pieces:
+            pieces.append(gap_samples)
+            position += len(gap_samples)
+        pieces.append(np.asarray(audio[start:end], dtype=np.float32))
+        packed_starts.append(position / sr)
+        original_starts.append(start / sr)
+        durations.append((end - start) / sr)
+        position += end - start
+    packed = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+    return packed, PackedTimeline(packed_starts, original_starts, durations)
+
+
+@njit(cache=_CACHE, nogil=True)
+def _frame_rms(y, start, end, frame, frame_length, hop_length):
+    # Кадр frame ділянки [start, end), доповненої нулями (center=True)
+    center = start + frame * hop_length
+    lo = max(start, center - frame_length // 2)
+    hi = min(end, center + frame_length // 2)
+    power = 0.0
+    for k in range(lo, hi):
+        power += float(y[k]) * float(y[k])
+    return np.sqrt(power / frame_length)
+
+
+@njit(cache=_CACHE, nogil=True)
+def _span_energy(y, start, end, stable_frames, stable_sum, frame_length, hop_length):
+    # Середнє RMS ділянки, як librosa.feature.rms(y=y[start:end]).mean().
+    # Кадри, вікно яких не доходить до кінця ділянки, не змінюються, коли
+    # ділянка подовжується, тож їхня сума переноситься між викликами.
+    n_frames = 1 + (end - start) // hop_length
+    reach = end - start - frame_length // 2
+    complete = 0 if reach < 0 else min(n_frames, reach // hop_length + 1)
+    for frame in range(stable_frames, complete):
+        stable_sum += _frame_rms(y, start, end, frame, frame_length, hop_length)
+    total = stable_sum
+    for frame in range(max(complete, stable_frames), n_frames):
+        total += _frame_rms(y, start, end, frame, frame_length, hop_length)
+    return total / n_frames, max(complete, stable_frames), stable_sum
+
+
+@njit(cache=_CACHE, nogil=True)
+def _merge_intervals(
+    y, starts, ends, sr, merge_threshold, energy_tolerance, frame_length, hop_length
+):
+    merged = np.empty((len(starts), 2), dtype=np.int64)
+    count = 0
+    prev_start, prev_end = starts[0], ends[0]
+    stable_frames, stable_sum = 0, 0.0
+    for k in range(1, len(starts)):
+        start, end = starts[k], ends[k]
+        if (start - prev_end) / sr < merge_threshold:
+            energy_prev, stable_frames, stable_sum = _span_energy(
+                y, prev_start, prev_end, stable_frames, stable_sum,
+                frame_length, hop_length,
+            )
+            energy_curr, _, _ = _span_energy(
+                y, start, end, 0, 0.0, frame_length, hop_length
+            )
+            if abs(energy_prev - energy_curr) < energy_tolerance:
+                prev_end = end
+                continue
+        merged[count, 0] = prev_start
+        merged[count, 1] = prev_end
+        count += 1
+        prev_start, prev_end = start, end
+        stable_frames, stable_sum = 0, 0.0
+    merged[count, 0] = prev_start
+    merged[count, 1] = prev_end
+    return merged[: count + 1]
+
+
+def merge_intervals(
+    y,
+    intervals,
+    sr,
+    merge_threshold,
+    energy_tolerance=0.1,
+    frame_length=2048,
+    hop_length=512,
+):
+    """Об'єднує сусідні ділянки, розділені паузою коротшою за merge_threshold,
+    якщо їхня середня RMS-енергія відрізняється менш ніж на energy_tolerance.
+
+    Енергія ділянки рахується так само, як librosa.feature.rms на зрізі
+    (кадр frame_length, крок hop_length, доповнення нулями), але без
+    копіювання зрізів і тимчасових масивів, тож прохід лінійний за
+    тривалістю запису.
+    """
+    intervals = np.asarray(intervals, dtype=np.int64).reshape(-1, 2)
+    if len(intervals) == 0:
+        return intervals
+    return _merge_intervals(
+        np.asarray(y),
+        np.ascontiguousarray(intervals[:, 0]),
+        np.ascontiguousarray(intervals[:, 1]),
+        float(sr),
+        float(merge_threshold),
+        float(energy_tolerance),
+        frame_length,
+        hop_length,
+    )
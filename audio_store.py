@@ -0,0 +1,168 @@
+# audio_store.py
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+STORE_DIR = os.path.abspath(os.path.join("cache", "audio"))
+DEFAULT_MAX_MB = int(os.environ.get("AUDIO_STORE_MB", "4096"))
+# Скільки останніх файлів тримати відображеними; старіші можна витіснити
+MAX_OPEN = int(os.environ.get("AUDIO_STORE_OPEN", "4"))
+
+_lock = threading.Lock()
+_key_locks = {}
+_opened = OrderedDict()  # Ключ -> (відліки, sr, шлях), від найдавнішого
+
+
+def _store_key(file_path, sr):
+    stat = os.stat(file_path)
+    payload = "|".join(
+        [os.path.abspath(file_path), str(stat.st_size), str(stat.st_mtime_ns)]
+        + [str(sr or "native")]
+    )
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _decode_with_ffmpeg(file_path, sr, target_path):
+    # ffmpeg пише PCM прямо у файл сховища, без проміжного буфера в пам'яті
+    cmd = [
+        "ffmpeg",
+        "-nostdin",
+        "-threads",
+        "0",
+        "-i",
+        file_path,
+        "-f",
+        "f32le",
+        "-ac",
+        "1",
+        "-acodec",
+        "pcm_f32le",
+        "-ar",
+        str(sr),
+        "-",
+    ]
+    with open(target_path, "wb") as out:
+        result = subprocess.run(cmd, stdout=out, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"Не вдалося декодувати аудіо: {result.stderr.decode(errors='ignore')}"
+        )
+    return os.path.getsize(target_path) // 4
+
+
+def _decode_native(file_path, target_path):
+    import librosa
+
+    # Рідна частота дискретизації, як і раніше в DTW-режимі
+    y, sr = librosa.load(file_path, sr=None)
+    np.ascontiguousarray(y, dtype=np.float32).tofile(target_path)
+    return len(y), sr
+
+
+def _open(data_path, length):
+    if length == 0:
+        return np.zeros(0, dtype=np.float32)
+    # mode="c": сторінки читаються з диска за потреби, запис не змінює файл
+    return np.memmap(data_path, dtype=np.float32, mode="c", shape=(length,))
+
+
+def load_audio(file_path, sr=None):
+    """Повертає (samples, sr): моно float32 PCM, відображений у пам'ять.
+
+    Файл декодується лише один раз для кожної частоти дискретизації
+    (sr=None — рідна частота). Наступні виклики з будь-якого місця програми
+    отримують представлення того самого файлу без повторного декодування.
+    """
+    key = _store_key(file_path, sr)
+    with _lock:
+        if key in _opened:
+            _opened.move_to_end(key)
+            return _opened[key][:2]
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+
+    with key_lock:
+        with _lock:
+            if key in _opened:
+                _opened.move_to_end(key)
+                return _opened[key][:2]
+
+        data_path = os.path.join(STORE_DIR, f"{key}.f32")
+        meta_path = os.path.join(STORE_DIR, f"{key}.json")
+        meta = None
+        if os.path.exists(meta_path) and os.path.exists(data_path):
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                os.utime(meta_path)
+            except (OSError, ValueError):
+                meta = None
+
+        if meta is None:
+            os.makedirs(STORE_DIR, exist_ok=True)
+            temp_path = f"{data_path}.{os.getpid()}.part"
+            if sr is None:
+                length, native_sr = _decode_native(file_path, temp_path)
+            else:
+                length, native_sr = _decode_with_ffmpeg(file_path, sr, temp_path), sr
+            os.replace(temp_path, data_path)
+            meta = {
+                "source": os.path.abspath(file_path),
+                "sr": native_sr,
+                "length": length,
+            }
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            _evict(keep=key)
+
+        samples = _open(data_path, meta["length"])
+        with _lock:
+            _opened[key] = (samples, meta["sr"], os.path.abspath(file_path))
+            # Витіснений масив лишається дійсним, доки на нього є посилання
+            while len(_opened) > MAX_OPEN:
+                evicted, _ = _opened.popitem(last=False)
+                _key_locks.pop(evicted, None)
+        return samples, meta["sr"]
+
+
+def release(file_path=None):
+    """Закриває відображення файлу (або всіх файлів), щоб звільнити пам'ять."""
+    source = os.path.abspath(file_path) if file_path else None
+    with _lock:
+        for key in list(_opened):
+            if source is None or _opened[key][2] == source:
+                del _opened[key]
+
+
+def _evict(keep, max_mb=DEFAULT_MAX_MB):
+    entries = []
+    for name in os.listdir(STORE_DIR):
+        if not name.endswith(".json"):
+            continue
+        key = name[:-5]
+        meta_path = os.path.join(STORE_DIR, name)
+        data_path = os.path.join(STORE_DIR, f"{key}.f32")
+        try:
+            size = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+            entries.append((os.path.getmtime(meta_path), size, key))
+        except OSError:
+            continue  # Запис щойно видалив інший процес
+    total = sum(size for _, size, _ in entries)
+    for _, size, key in sorted(entries):
+        if total <= max_mb * 1024 * 1024:
+            break
+        # Поточний та вже відкриті файли не видаляються
+        if key == keep or key in _opened:
+            continue
+        try:
+            os.remove(os.path.join(STORE_DIR, f"{key}.json"))
+            os.remove(os.path.join(STORE_DIR, f"{key}.f32"))
+        except OSError:
+            continue  # Файл ще відображений іншим процесом
+        total -= size
+        logging.info(f"Декодоване аудіо {key} видалено зі сховища (ліміт розміру)")
@@ -0,0 +1,304 @@
+# batch_transcription.py
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+MEDIA_EXTENSIONS = (
+    ".wav",
+    ".mp3",
+    ".m4a",
+    ".flac",
+    ".ogg",
+    ".opus",
+    ".mp4",
+    ".mkv",
+    ".avi",
+    ".mov",
+    ".webm",
+)
+
+
+def collect_files(inputs):
+    """Розгортає каталоги (рекурсивно) та glob-шаблони у список медіафайлів."""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                for name in sorted(names):
+                    if name.lower().endswith(MEDIA_EXTENSIONS):
+                        files.append(os.path.join(root, name))
+        else:
+            matches = glob.glob(item, recursive=True) if glob.has_magic(item) else [item]
+            files.extend(path for path in sorted(matches) if os.path.isfile(path))
+    # Один файл, переданий кількома шляхами, обробляється один раз
+    unique = {}
+    for path in files:
+        unique.setdefault(os.path.abspath(path), None)
+    return list(unique)
+
+
+def output_base(file_path, root, output_dir):
+    # Розширення джерела лишається в назві (talk.mp3.srt), тож talk.mp3 і
+    # talk.wav з одного каталогу не перезаписують результати одне одного
+    relative = os.path.relpath(file_path, root) if root else os.path.basename(file_path)
+    return os.path.join(output_dir, relative)
+
+
+def format_time_srt(seconds):
+    hrs, rem = divmod(seconds, 3600)
+    mins, rem = divmod(rem, 60)
+    secs, ms = divmod(rem, 1)
+    ms = int(ms * 1000)
+    return f"{int(hrs):02}:{int(mins):02}:{int(secs):02},{ms:03}"
+
+
+def write_outputs(transcription, base, formats):
+    os.makedirs(os.path.dirname(base) or ".", exist_ok=True)
+    outputs = []
+    if "jsonl" in formats:
+        path = base + ".jsonl"
+        with open(path + ".part", "w", encoding="utf-8") as f:
+            for segment in transcription:
+                record = {
+                    "start": segment["start"],
+                    "end": segment["end"],
+                    "text": segment["text"],
+                }
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(path + ".part", path)
+        outputs.append(path)
+    if "srt" in formats:
+        path = base + ".srt"
+        with open(path + ".part", "w", encoding="utf-8") as f:
+            for i, segment in enumerate(transcription, start=1):
+                start_time = format_time_srt(segment["start"])
+                end_time = format_time_srt(segment["end"])
+                text = segment["text"].strip()
+                f.write(f"{i}\n{start_time} --> {end_time}\n{text}\n\n")
+        os.replace(path + ".part", path)
+        outputs.append(path)
+    return outputs
+
+
+class Manifest:
+    """Журнал виконаних завдань у форматі JSONL.
+
+    Кожен завершений файл дописується окремим рядком і одразу скидається на
+    диск, тож перерваний запуск продовжується з місця зупинки.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Обірваний останній рядок після аварійного завершення
+                    self.records[record["path"]] = record
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def is_done(self, file_path, settings):
+        record = self.records.get(file_path)
+        if not record or record.get("status") != "done":
+            return False
+        stat = os.stat(file_path)
+        return (
+            record.get("size") == stat.st_size
+            and record.get("mtime") == stat.st_mtime_ns
+            and record.get("settings") == settings
+            and all(os.path.exists(path) for path in record.get("outputs", []))
+        )
+
+    def add(self, record):
+        self.records[record["path"]] = record
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def _init_batch_worker(threads):
+    import torch
+
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+
+def _process_file(file_path, base, settings, formats):
+    # Модель залишається в пулі процесу-виконавця між файлами
+    from instrumentation import timed
+    from transcription import transcribe_audio
+
+    started = time.perf_counter()
+    stat = os.stat(file_path)
+    events = []
+    transcription = transcribe_audio(
+        file_path,
+        settings["model"],
+        settings["language"],
+        settings["device"],
+        event_callback=events.append,
+        workers=settings["chunk_workers"],
+    )
+    record = {
+        "path": file_path,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "settings": settings,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+    # Остання позиція декодера: тривалість аудіо і швидкість декодування
+    decoded = [event for event in events if event["rtf"] is not None]
+    if decoded:
+        record["audio_seconds"] = round(decoded[-1]["total"], 2)
+        record["rtf"] = round(decoded[-1]["rtf"], 3)
+    if isinstance(transcription, dict) and "error" in transcription:
+        record.update(status="error", error=transcription["error"], outputs=[])
+    else:
+        with timed("whisper", "export", file=file_path):
+            outputs = write_outputs(transcription, base, formats)
+        record.update(status="done", segments=len(transcription), outputs=outputs)
+    return record
+
+
+def run_batch(
+    inputs,
+    output_dir,
+    model_name="base",
+    language="uk",
+    device="cpu",
+    jobs=1,
+    formats=("jsonl", "srt"),
+    manifest_path=None,
+    chunk_workers=1,
+):
+    files = collect_files(inputs)
+    if not files:
+        print("Не знайдено файлів для транскрибування", file=sys.stderr)
+        return 1
+
+    settings = {
+        "model": model_name,
+        "language": language,
+        "device": device,
+        "chunk_workers": chunk_workers,
+        # Список, а не кортеж: так налаштування збігаються після читання JSON
+        "formats": sorted(set(formats)),
+    }
+    try:
+        root = os.path.commonpath([os.path.dirname(path) for path in files])
+    except ValueError:
+        root = None  # Файли на різних дисках
+    manifest = Manifest(manifest_path or os.path.join(output_dir, "manifest.jsonl"))
+    pending = [path for path in files if not manifest.is_done(path, settings)]
+    print(
+        f"Файлів: {len(files)}, уже виконано: {len(files) - len(pending)}, "
+        f"до обробки: {len(pending)}"
+    )
+
+    jobs = max(1, jobs)
+    threads = max(1, (os.cpu_count() or 1) // jobs)
+    failed = 0
+    done = 0
+    # Черга обмежена: одночасно в пулі не більше 2 * jobs завдань
+    queue = iter(pending)
+    in_flight = {}
+    try:
+        with ProcessPoolExecutor(
+            max_workers=jobs, initializer=_init_batch_worker, initargs=(threads,)
+        ) as executor:
+            while True:
+                while len(in_flight) < jobs * 2:
+                    path = next(queue, None)
+                    if path is None:
+                        break
+                    base = output_base(path, root, output_dir)
+                    future = executor.submit(
+                        _process_file, path, base, settings, formats
+                    )
+                    in_flight[future] = path
+                if not in_flight:
+                    break
+                completed, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    path = in_flight.pop(future)
+                    try:
+                        record = future.result()
+                    except Exception as e:
+                        record = {"path": path, "status": "error", "error": str(e)}
+                    manifest.add(record)
+                    done += 1
+                    if record["status"] == "done":
+                        speed = f" (RTF {record['rtf']})" if "rtf" in record else ""
+                        print(
+                            f"[{done}/{len(pending)}] {path}: "
+                            f"{record['seconds']} с{speed}"
+                        )
+                    else:
+                        failed += 1
+                        print(
+                            f"[{done}/{len(pending)}] {path}: Помилка: {record['error']}",
+                            file=sys.stderr,
+                        )
+    finally:
+        manifest.close()
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Пакетне транскрибування аудіо/відео без графічного інтерфейсу"
+    )
+    parser.add_argument("inputs", nargs="+", help="Файли, каталоги або glob-шаблони")
+    parser.add_argument("-o", "--output-dir", default="transcripts")
+    parser.add_argument("-m", "--model", default="base")
+    parser.add_argument("-l", "--language", default="uk")
+    parser.add_argument("-d", "--device", default="cpu")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1, help="Кількість процесів-виконавців"
+    )
+    parser.add_argument(
+        "--chunk-workers",
+        type=int,
+        default=1,
+        help="Процесів на один файл для паралельного транскрибування частин",
+    )
+    parser.add_argument(
+        "--format",
+        dest="formats",
+        action="append",
+        choices=["jsonl", "srt"],
+        help="Формат результату (можна вказати кілька разів)",
+    )
+    parser.add_argument(
+        "--manifest", help="Шлях до журналу завдань (типово OUTPUT_DIR/manifest.jsonl)"
+    )
+    args = parser.parse_args(argv)
+
+    return run_batch(
+        args.inputs,
+        args.output_dir,
+        model_name=args.model,
+        language=args.language,
+        device=args.device,
+        jobs=args.jobs,
+        formats=tuple(args.formats or ("jsonl", "srt")),
+        manifest_path=args.manifest,
+        chunk_workers=args.chunk_workers,
+    )
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
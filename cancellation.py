@@ -0,0 +1,24 @@
+# cancellation.py
+import threading
+
+
+class TranscriptionCancelled(Exception):
+    pass
+
+
+class CancellationToken:
+    """Прапорець кооперативної зупинки, який перевіряє транскрибування."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise TranscriptionCancelled()
@@ -1,8 +1,23 @@
 #config_window.py
 import os
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QComboBox, QFileDialog
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QComboBox, QFileDialog, QCheckBox
 from PyQt6.QtGui import QPixmap
-import torch
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
+
+
+class CudaProbe(QThread):
+    detected = pyqtSignal(bool)  # Чи доступна CUDA
+
+    def run(self):
+        # torch імпортується кілька секунд, тому не в потоці інтерфейсу
+        try:
+            import torch
+
+            available = torch.cuda.is_available()
+        except Exception:
+            available = False
+        self.detected.emit(available)
+
 
 class ConfigWindow(QWidget):
     def __init__(self, parent, file_path=None):
@@ -128,15 +143,17 @@ class ConfigWindow(QWidget):
         device_label = QLabel("Пристрій:")
         device_label.setStyleSheet("font-size: 14px; color: white;")
         device_layout.addWidget(device_label)
+        self.device_label = device_label
         self.device_select = QComboBox()
-
-        if torch.cuda.is_available():
-            self.device_select.addItems(["cpu", "cuda"])
-        else:
-            self.device_select.addItems(["cpu"])
-            # Опціонально: додайте підказку, що CUDA недоступна
-            device_label.setToolTip("CUDA недоступна на цьому пристрої")
-        
+        self.device_select.addItems(["cpu", "cpu-int8"])
+        # "cuda" додається, коли фонова перевірка в Interface завершиться
+        self.set_cuda_available(getattr(parent, "cuda_available", None))
+
+        self.device_select.setItemData(
+            self.device_select.findText("cpu-int8"),
+            "Швидший режим для CPU: int8-квантизація лінійних шарів моделі",
+            Qt.ItemDataRole.ToolTipRole,
+        )
         self.device_select.setStyleSheet("""
             background: #333; color: white; border: 1px solid #444; 
             padding: 5px; border-radius: 5px;
@@ -144,6 +161,15 @@ class ConfigWindow(QWidget):
         device_layout.addWidget(self.device_select)
         layout.addLayout(device_layout)
 
+        # Пропуск тиші перед розпізнаванням
+        self.vad_checkbox = QCheckBox("Пропускати тишу (VAD)")
+        self.vad_checkbox.setToolTip(
+            "Модель обробляє лише ділянки з мовленням: швидше на записах з довгими паузами "
+            "і менше вигаданого тексту в тиші"
+        )
+        self.vad_checkbox.setStyleSheet("font-size: 14px; color: white; margin-top: 10px;")
+        layout.addWidget(self.vad_checkbox)
+
 
         # Кнопка "Почати транскрибувати"
         self.start_btn = QPushButton("Почати транскрибування")
@@ -161,6 +187,16 @@ class ConfigWindow(QWidget):
 
         layout.addStretch()
 
+    def set_cuda_available(self, available):
+        if available is None:
+            self.device_label.setToolTip("Перевірка доступності CUDA...")
+        elif available:
+            if self.device_select.findText("cuda") < 0:
+                self.device_select.addItem("cuda")
+            self.device_label.setToolTip("")
+        else:
+            self.device_label.setToolTip("CUDA недоступна на цьому пристрої")
+
     def set_file_path(self, file_path):
         self.file_path = file_path
         self.file_list.setText("Немає вибраного файлу" if not file_path else f"{os.path.basename(file_path)}")
@@ -182,7 +218,8 @@ class ConfigWindow(QWidget):
         if not self.file_path:
             return
         self.parent.switch_to_result(self.file_path, self.model_select.currentText(), 
-                                    self.language_select.currentText(), self.device_select.currentText())
+                                    self.language_select.currentText(), self.device_select.currentText(),
+                                    self.vad_checkbox.isChecked())
 
     def back_to_main(self):
         self.parent.switch_to_main()
\ No newline at end of file
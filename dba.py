@@ -0,0 +1,90 @@
+# dba.py
+import numpy as np
+
+from dtw_engine import dtw_distance_matrix, dtw_path
+from dtw_features import normalize_frames
+
+
+def medoid_index(distances):
+    """Індекс послідовності з найменшою сумою відстаней до решти."""
+    # Пари поза смугою Сакое-Чиби мають нескінченну відстань
+    finite = np.where(np.isfinite(distances), distances, 1e12)
+    return int(np.argmin(finite.sum(axis=1)))
+
+
+def dba(sequences, n_iterations=10, tolerance=1e-4, initial=None):
+    """Усереднення DTW (DBA): послідовність, найближча до всіх sequences.
+
+    Починаючи з медоїда, кожен кадр центроїда замінюється середнім усіх
+    кадрів, вирівняних із ним DTW, доки центроїд не перестане змінюватися.
+    """
+    sequences = [np.asarray(seq, dtype=np.float64) for seq in sequences]
+    if len(sequences) == 1:
+        return sequences[0].copy()
+    if initial is None:
+        initial = sequences[medoid_index(dtw_distance_matrix(sequences, sequences))]
+    centroid = np.array(initial, dtype=np.float64)
+    for _ in range(n_iterations):
+        sums = np.zeros_like(centroid)
+        counts = np.zeros(len(centroid))
+        for seq in sequences:
+            _, path = dtw_path(centroid, seq)
+            np.add.at(sums, path[:, 0], seq[path[:, 1]])
+            np.add.at(counts, path[:, 0], 1)
+        updated = sums / np.maximum(counts, 1)[:, None]
+        change = np.abs(updated - centroid).max()
+        centroid = updated
+        if change < tolerance:
+            break
+    # Ознаки запитів нормалізуються по послідовності, тож і центроїд теж
+    return normalize_frames(centroid)
+
+
+def k_medoids(distances, k, n_iterations=20):
+    """Розбиває послідовності на k груп за матрицею відстаней DTW."""
+    n = len(distances)
+    if k >= n:
+        return [[i] for i in range(n)]
+    distances = np.where(np.isfinite(distances), distances, 1e12)
+    medoids = [medoid_index(distances)]
+    # Наступні медоїди — найвіддаленіші від уже вибраних (детерміновано)
+    while len(medoids) < k:
+        nearest = distances[:, medoids].min(axis=1)
+        nearest[medoids] = -1
+        medoids.append(int(np.argmax(nearest)))
+    medoids = np.array(medoids)
+    for _ in range(n_iterations):
+        labels = np.argmin(distances[:, medoids], axis=1)
+        labels[medoids] = np.arange(k)
+        updated = medoids.copy()
+        for c in range(k):
+            members = np.flatnonzero(labels == c)
+            if len(members):
+                within = distances[np.ix_(members, members)].sum(axis=1)
+                updated[c] = members[np.argmin(within)]
+        if (updated == medoids).all():
+            break
+        medoids = updated
+    labels = np.argmin(distances[:, medoids], axis=1)
+    labels[medoids] = np.arange(k)
+    return [list(np.flatnonzero(labels == c)) for c in range(k)]
+
+
+def word_centroids(sequences, max_centroids=1, n_iterations=10):
+    """Один або кілька DBA-центроїдів для записів одного слова.
+
+    Якщо записів достатньо (щонайменше два на групу), вони спершу
+    розбиваються k-medoids на max_centroids груп вимови.
+    """
+    k = max(1, min(max_centroids, len(sequences) // 2))
+    if k == 1:
+        return [dba(sequences, n_iterations=n_iterations)]
+    distances = dtw_distance_matrix(sequences, sequences)
+    centroids = []
+    for members in k_medoids(distances, k):
+        group = [sequences[i] for i in members]
+        sub = distances[np.ix_(members, members)]
+        centroids.append(
+            dba(group, n_iterations=n_iterations, initial=group[medoid_index(sub)])
+        )
+    return centroids
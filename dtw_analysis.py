@@ -0,0 +1,228 @@
+# dtw_analysis.py
+import argparse
+import sys
+
+import numpy as np
+
+from dba import word_centroids
+from dtw_engine import MAX_DTW_DISTANCE, dtw_distance_matrix
+from template_index import TemplateIndex
+
+UNKNOWN = "[unknown]"
+
+
+def load_labelled(directory, n_mfcc):
+    """Ознаки всіх записів каталогу зі словами, взятими з імен файлів."""
+    index = TemplateIndex(directory, n_mfcc=n_mfcc).build()
+    names, labels, features = [], [], []
+    for word, references in index.items():
+        for ref_file, seq in references:
+            names.append(ref_file)
+            labels.append(word)
+            features.append(seq)
+    return names, labels, features
+
+
+def nearest(matrix, ref_labels, exclude_self=False):
+    """Найближчий еталон для кожного запиту: (слова, відстані)."""
+    matrix = matrix.copy()
+    if exclude_self:
+        np.fill_diagonal(matrix, np.inf)  # Перехресна перевірка без самого себе
+    best = np.argmin(matrix, axis=1)
+    distances = matrix[np.arange(len(matrix)), best]
+    words = [
+        ref_labels[k] if np.isfinite(d) else UNKNOWN for k, d in zip(best, distances)
+    ]
+    return words, distances
+
+
+def word_members(labels):
+    """Слово -> індекси його записів."""
+    members = {}
+    for k, word in enumerate(labels):
+        members.setdefault(word, []).append(k)
+    return members
+
+
+def centroid_templates(labels, features, max_centroids):
+    """DBA-центроїди кожного слова: (центроїди, їхні слова)."""
+    templates, template_labels = [], []
+    for word, indices in word_members(labels).items():
+        sequences = [features[k] for k in indices]
+        for centroid in word_centroids(sequences, max_centroids=max_centroids):
+            templates.append(centroid)
+            template_labels.append(word)
+    return templates, template_labels
+
+
+def nearest_centroids(
+    ref_labels, ref_features, features, max_centroids, leave_one_out
+):
+    """Найближчий центроїд для кожного запиту: (слова, відстані).
+
+    Центроїди всіх слів будуються один раз. При перехресній перевірці
+    перебудовуються лише центроїди слова запиту, без самого запиту, тож
+    оцінка чесна, як і для окремих еталонів.
+    """
+    templates, labels = centroid_templates(ref_labels, ref_features, max_centroids)
+    matrix = dtw_distance_matrix(features, templates)
+    labels = np.array(labels, dtype=object)
+    members = word_members(ref_labels)
+    words, distances = [], []
+    for k, row in enumerate(matrix):
+        row_labels = labels
+        if leave_one_out and k < len(ref_features):
+            word = ref_labels[k]
+            others = [ref_features[j] for j in members[word] if j != k]
+            own = word_centroids(others, max_centroids=max_centroids) if others else []
+            keep = labels != word
+            row = np.concatenate(
+                [row[keep], dtw_distance_matrix([features[k]], own)[0]]
+            )
+            row_labels = np.concatenate([labels[keep], [word] * len(own)])
+        best = int(np.argmin(row)) if len(row) else None
+        if best is None or not np.isfinite(row[best]):
+            words.append(UNKNOWN)
+            distances.append(np.inf)
+        else:
+            words.append(row_labels[best])
+            distances.append(row[best])
+    return words, np.array(distances), len(templates)
+
+
+def decide(words, distances, threshold):
+    return [w if d < threshold else UNKNOWN for w, d in zip(words, distances)]
+
+
+def confusion(true_labels, predicted):
+    labels = sorted((set(true_labels) | set(predicted)) - {UNKNOWN}) + [UNKNOWN]
+    position = {label: i for i, label in enumerate(labels)}
+    table = np.zeros((len(labels), len(labels)), dtype=int)
+    for true, pred in zip(true_labels, predicted):
+        table[position[true], position[pred]] += 1
+    return labels, table
+
+
+def threshold_sweep(true_labels, words, distances, thresholds):
+    """Частка правильних рішень для кожного порогу.
+
+    Для записів зі словника правильне рішення — вгадане слово, для
+    сторонніх записів (мітка [unknown]) — відмова від розпізнавання.
+    """
+    rows = []
+    for threshold in thresholds:
+        predicted = decide(words, distances, threshold)
+        correct = sum(t == p for t, p in zip(true_labels, predicted))
+        accepted = sum(p != UNKNOWN for p in predicted)
+        total = len(true_labels)
+        rows.append((threshold, correct / total, accepted / total))
+    return rows
+
+
+def print_confusion(labels, table, out=sys.stdout):
+    width = max(len(label) for label in labels) + 2
+    header = "".join(label.rjust(width) for label in labels)
+    print("".ljust(width) + header, file=out)
+    for label, row in zip(labels, table):
+        cells = "".join(str(value).rjust(width) for value in row)
+        print(label.ljust(width) + cells, file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Аналіз відстаней DTW: матриця плутанини слів і підбір порогу"
+    )
+    parser.add_argument("references", help="Каталог еталонів (слово_N.wav)")
+    parser.add_argument(
+        "--queries",
+        help="Каталог підписаних записів для перевірки "
+        "(типово — перехресна перевірка на самих еталонах)",
+    )
+    parser.add_argument(
+        "--negatives", help="Каталог записів поза словником (очікується [unknown])"
+    )
+    parser.add_argument("--n-mfcc", type=int, default=20)
+    parser.add_argument("--threshold", type=float, default=MAX_DTW_DISTANCE)
+    parser.add_argument(
+        "--sweep",
+        type=float,
+        nargs=3,
+        metavar=("FROM", "TO", "STEP"),
+        help="Діапазон порогів для підбору (типово 0..100 з кроком 2.5)",
+    )
+    parser.add_argument("--save-matrix", help="Зберегти матрицю відстаней у .npz")
+    parser.add_argument(
+        "--centroids",
+        type=int,
+        metavar="K",
+        help="Також оцінити DBA-центроїди (до K шаблонів на слово)",
+    )
+    args = parser.parse_args(argv)
+
+    ref_names, ref_labels, ref_features = load_labelled(args.references, args.n_mfcc)
+    if not ref_features:
+        print("Не знайдено еталонів", file=sys.stderr)
+        return 1
+
+    if args.queries:
+        names, labels, features = load_labelled(args.queries, args.n_mfcc)
+    else:
+        names, labels, features = ref_names, ref_labels, ref_features
+    if args.negatives:
+        neg_names, _, neg_features = load_labelled(args.negatives, args.n_mfcc)
+        names = names + neg_names
+        labels = labels + [UNKNOWN] * len(neg_names)
+        features = features + neg_features
+
+    print(f"Обчислюємо {len(features)} x {len(ref_features)} відстаней DTW...")
+    matrix = dtw_distance_matrix(features, ref_features)
+    if args.save_matrix:
+        np.savez(
+            args.save_matrix,
+            distances=matrix,
+            queries=np.array(names),
+            query_labels=np.array(labels),
+            references=np.array(ref_names),
+            reference_labels=np.array(ref_labels),
+        )
+
+    # Для перехресної перевірки запит не порівнюється з самим собою
+    words, distances = nearest(matrix, ref_labels, exclude_self=not args.queries)
+    predicted = decide(words, distances, args.threshold)
+    correct = sum(t == p for t, p in zip(labels, predicted))
+    print(
+        f"\nПоріг {args.threshold:g}: правильно {correct}/{len(labels)} "
+        f"({correct / len(labels):.1%})\n"
+    )
+    print_confusion(*confusion(labels, predicted))
+
+    start, stop, step = args.sweep or (0.0, 100.0, 2.5)
+    thresholds = np.arange(start, stop + step / 2, step)
+    sweep = threshold_sweep(labels, words, distances, thresholds)
+    print("\nПоріг   Правильно   Прийнято")
+    for threshold, accuracy, accepted in sweep:
+        print(f"{threshold:7.2f} {accuracy:10.1%} {accepted:10.1%}")
+    best = max(sweep, key=lambda row: row[1])
+    print(f"\nНайкращий поріг: {best[0]:g} (правильно {best[1]:.1%})")
+
+    if args.centroids:
+        c_words, c_distances, n_templates = nearest_centroids(
+            ref_labels,
+            ref_features,
+            features,
+            args.centroids,
+            leave_one_out=not args.queries,
+        )
+        c_predicted = decide(c_words, c_distances, args.threshold)
+        c_correct = sum(t == p for t, p in zip(labels, c_predicted))
+        print(
+            f"\nЦентроїди (до {args.centroids} на слово): шаблонів {n_templates} "
+            f"замість {len(ref_features)}, правильно {c_correct}/{len(labels)} "
+            f"({c_correct / len(labels):.1%}) проти {correct / len(labels):.1%}\n"
+        )
+        print_confusion(*confusion(labels, c_predicted))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,425 @@
+# dtw_engine.py
+import sys
+
+import numpy as np
+from numba import get_num_threads, njit, prange
+
+# У зібраному PyInstaller-застосунку немає вихідних файлів для кешу numba
+_CACHE = not getattr(sys, "frozen", False)
+# Дозволяє векторизувати скалярні добутки; без nnan/ninf, бо ядра працюють з inf
+_FASTMATH = {"contract", "reassoc", "nsz", "arcp"}
+
+# Сегмент вважається розпізнаним, лише якщо відстань DTW менша за поріг
+MAX_DTW_DISTANCE = 50
+
+# Стадії, на яких зупинилося порівняння з кандидатом у _match
+_PRUNED_KEOGH = 0
+_ABANDONED = 1
+_COMPLETED = 2
+
+
+def normalize_rows(seq):
+    """Повертає (seq, норми рядків) у float64 — норми рахуються один раз на послідовність."""
+    seq = np.ascontiguousarray(seq, dtype=np.float64)
+    return seq, np.linalg.norm(seq, axis=1)
+
+
+class PreparedSequence:
+    """Послідовність ознак із наперед обчисленими нормами та одиничними рядками.
+
+    Еталони готуються один раз і далі порівнюються з кожним сегментом.
+    """
+
+    def __init__(self, seq):
+        self.values, self.norms = normalize_rows(seq)
+        # Нульові рядки залишаються нульовими векторами
+        self.unit = self.values / np.maximum(self.norms, 1e-12)[:, None]
+        self.min_norm = float(self.norms.min()) if len(self.norms) else 0.0
+
+    def __len__(self):
+        return len(self.values)
+
+
+def prepare(seq):
+    return seq if isinstance(seq, PreparedSequence) else PreparedSequence(seq)
+
+
+def sakoe_chiba_window(n, m):
+    return max(n, m) // 3
+
+
+@njit(cache=_CACHE, nogil=True, fastmath=_FASTMATH)
+def _banded_dtw(q_vals, q_norms, r_vals, r_norms, window, threshold, tail):
+    # Косинусні відстані рахуються лише для клітинок смуги і лише доки
+    # обчислення не припинено; зберігаємо два рядки накопиченої вартості
+    n, m, dims = q_vals.shape[0], r_vals.shape[0], q_vals.shape[1]
+    prev = np.full(m + 1, np.inf)
+    curr = np.full(m + 1, np.inf)
+    prev[0] = 0.0
+    for i in range(1, n + 1):
+        curr[:] = np.inf
+        j_min = max(1, i - window)
+        j_max = min(m, i + window)
+        row_min = np.inf
+        for j in range(j_min, j_max + 1):
+            dot = 0.0
+            for k in range(dims):
+                dot += q_vals[i - 1, k] * r_vals[j - 1, k]
+            best = prev[j]
+            if curr[j - 1] < best:
+                best = curr[j - 1]
+            if prev[j - 1] < best:
+                best = prev[j - 1]
+            curr[j] = 1.0 - dot / (q_norms[i - 1] * r_norms[j - 1] + 1e-8) + best
+            if curr[j] < row_min:
+                row_min = curr[j]
+        # Раннє припинення: шлях ще мусить пройти всі наступні рядки,
+        # які разом коштують щонайменше tail[i - 1]
+        if row_min + tail[i - 1] >= threshold:
+            return np.inf
+        prev, curr = curr, prev
+    return prev[m]
+
+
+@njit(cache=_CACHE, nogil=True, fastmath=_FASTMATH)
+def _lb_keogh_rows(q_unit, q_norms, r_unit, r_min_norm, window):
+    n, m, dims = q_unit.shape[0], r_unit.shape[0], q_unit.shape[1]
+    size = 2 * window + 1
+    # Кадр t доповненого еталона — це кадр t - window, обмежений краями;
+    # крайні кадри і так потрапляють у смугу, тож обвідна не змінюється.
+    # Ковзні максимум і мінімум рахуються алгоритмом ван Герка за O(length)
+    length = n + 2 * window
+    prefix_max = np.empty((length, dims))
+    prefix_min = np.empty((length, dims))
+    suffix_max = np.empty((length, dims))
+    suffix_min = np.empty((length, dims))
+    for block in range(0, length, size):
+        block_end = min(block + size, length)
+        row = r_unit[min(max(block - window, 0), m - 1)]
+        prefix_max[block] = row
+        prefix_min[block] = row
+        for t in range(block + 1, block_end):
+            row = r_unit[min(max(t - window, 0), m - 1)]
+            for k in range(dims):
+                prefix_max[t, k] = max(prefix_max[t - 1, k], row[k])
+                prefix_min[t, k] = min(prefix_min[t - 1, k], row[k])
+        row = r_unit[min(max(block_end - 1 - window, 0), m - 1)]
+        suffix_max[block_end - 1] = row
+        suffix_min[block_end - 1] = row
+        for t in range(block_end - 2, block - 1, -1):
+            row = r_unit[min(max(t - window, 0), m - 1)]
+            for k in range(dims):
+                suffix_max[t, k] = max(suffix_max[t + 1, k], row[k])
+                suffix_min[t, k] = min(suffix_min[t + 1, k], row[k])
+
+    rows = np.empty(n)
+    for i in range(n):
+        last = i + size - 1
+        total = 0.0
+        for k in range(dims):
+            upper = max(suffix_max[i, k], prefix_max[last, k])
+            lower = min(suffix_min[i, k], prefix_min[last, k])
+            value = q_unit[i, k]
+            total += max(value - upper, 0.0) ** 2 + max(lower - value, 0.0) ** 2
+        # Поправка на +1e-8 у знаменнику косинусної відстані
+        slack = 1e-8 / (q_norms[i] * r_min_norm + 1e-8)
+        rows[i] = max(0.5 * total - slack, 0.0)
+    return rows
+
+
+@njit(cache=_CACHE, nogil=True)
+def _match(q_vals, q_norms, q_unit, r_vals, r_norms, r_unit, r_min_norm, window, best):
+    rows = _lb_keogh_rows(q_unit, q_norms, r_unit, r_min_norm, window)
+    n = rows.shape[0]
+    tail = np.empty(n)
+    remaining = 0.0
+    for i in range(n - 1, -1, -1):
+        tail[i] = remaining
+        remaining += rows[i]
+    if remaining >= best:
+        return np.inf, _PRUNED_KEOGH
+    distance = _banded_dtw(q_vals, q_norms, r_vals, r_norms, window, best, tail)
+    if distance == np.inf:
+        return distance, _ABANDONED
+    return distance, _COMPLETED
+
+
+def dtw_distance(seq1, seq2, window=None):
+    """DTW з косинусною відстанню у смузі Сакое-Чиби шириною max(n, m) // 3."""
+    n, m = len(seq1), len(seq2)
+    if n == 0 or m == 0:
+        return np.inf
+    if window is None:
+        window = sakoe_chiba_window(n, m)
+    seq1, seq2 = prepare(seq1), prepare(seq2)
+    return float(
+        _banded_dtw(
+            seq1.values, seq1.norms, seq2.values, seq2.norms, window, np.inf, np.zeros(n)
+        )
+    )
+
+
+@njit(cache=_CACHE, nogil=True, fastmath=_FASTMATH)
+def _dtw_path(q_vals, q_norms, r_vals, r_norms, window):
+    n, m, dims = q_vals.shape[0], r_vals.shape[0], q_vals.shape[1]
+    cost = np.full((n + 1, m + 1), np.inf)
+    cost[0, 0] = 0.0
+    for i in range(1, n + 1):
+        for j in range(max(1, i - window), min(m, i + window) + 1):
+            dot = 0.0
+            for k in range(dims):
+                dot += q_vals[i - 1, k] * r_vals[j - 1, k]
+            best = min(cost[i - 1, j - 1], cost[i - 1, j], cost[i, j - 1])
+            cost[i, j] = 1.0 - dot / (q_norms[i - 1] * r_norms[j - 1] + 1e-8) + best
+    # Зворотний прохід від кінцевої клітинки; за рівності — діагональ
+    path = np.empty((n + m, 2), dtype=np.int64)
+    i, j, length = n, m, 0
+    while i > 0 and j > 0:
+        path[length, 0] = i - 1
+        path[length, 1] = j - 1
+        length += 1
+        diag, up, left = cost[i - 1, j - 1], cost[i - 1, j], cost[i, j - 1]
+        if diag <= up and diag <= left:
+            i, j = i - 1, j - 1
+        elif up <= left:
+            i -= 1
+        else:
+            j -= 1
+    return cost[n, m], path[:length][::-1]
+
+
+def dtw_path(seq1, seq2, window=None):
+    """Відстань DTW і шлях вирівнювання — масив пар (i, j) від початку до кінця.
+
+    Якщо смуга за замовчуванням не допускає вирівнювання (довжини надто
+    різні), вона розширюється до повної матриці.
+    """
+    seq1, seq2 = prepare(seq1), prepare(seq2)
+    n, m = len(seq1), len(seq2)
+    if n == 0 or m == 0:
+        return np.inf, np.zeros((0, 2), dtype=np.int64)
+    if window is None:
+        window = sakoe_chiba_window(n, m)
+    if abs(n - m) > window:
+        window = max(n, m)
+    distance, path = _dtw_path(seq1.values, seq1.norms, seq2.values, seq2.norms, window)
+    return float(distance), path
+
+
+def lb_kim(query, ref):
+    """Нижня межа LB_Kim: будь-який шлях DTW містить першу та останню пари кадрів."""
+    n, m = len(query), len(ref)
+    if n == 0 or m == 0 or abs(n - m) > sakoe_chiba_window(n, m):
+        return np.inf  # Кінцева клітинка поза смугою — DTW нескінченний
+    ends = [(0, 0), (n - 1, m - 1)] if n > 1 or m > 1 else [(0, 0)]
+    bound = 0.0
+    for i, j in ends:
+        bound += 1.0 - float(query.values[i] @ ref.values[j]) / (
+            query.norms[i] * ref.norms[j] + 1e-8
+        )
+    return bound
+
+
+def lb_keogh(query, ref, window=None):
+    """Нижня межа LB_Keogh для смуги Сакое-Чиби, по рядках запиту.
+
+    Для одиничних векторів 1 - cos = |a - b|^2 / 2, тож відстань до будь-якого
+    кадру еталона в смузі не менша за відстань до його обвідної. Поправка
+    на +1e-8 у знаменнику косинусної відстані зберігає межу строгою і для
+    тихих кадрів.
+    """
+    query, ref = prepare(query), prepare(ref)
+    n, m = len(query), len(ref)
+    if window is None:
+        window = sakoe_chiba_window(n, m)
+    if abs(n - m) > window:
+        return np.full(n, np.inf)
+    return _lb_keogh_rows(query.unit, query.norms, ref.unit, ref.min_norm, window)
+
+
+def search(query, candidates, threshold=np.inf):
+    """Шукає найближчий еталон каскадом нижніх меж.
+
+    candidates — список (мітка, PreparedSequence). Кандидати перебираються
+    в порядку зростання LB_Kim; якщо межа не менша за найкращу знайдену
+    відстань (спочатку — threshold), DTW не обчислюється. Далі так само
+    перевіряється LB_Keogh, а саме DTW припиняється достроково, щойно
+    часткова вартість перевищує найкращу.
+
+    Повертає (мітка, відстань, статистика); мітка None, якщо жоден
+    еталон не ближчий за threshold.
+    """
+    query = prepare(query)
+    stats = {
+        "candidates": len(candidates),
+        "kim": 0,
+        "keogh": 0,
+        "abandoned": 0,
+        "dtw": 0,
+    }
+    best_label, best = None, float(threshold)
+    if len(query) == 0:
+        stats["kim"] = len(candidates)
+        return best_label, best, stats
+    order = sorted(
+        ((lb_kim(query, ref), k) for k, (_, ref) in enumerate(candidates)),
+        key=lambda item: item[0],
+    )
+    for position, (bound, k) in enumerate(order):
+        if bound >= best:
+            # Межі впорядковані, тож решта кандидатів теж відсікається
+            stats["kim"] += len(order) - position
+            break
+        label, ref = candidates[k]
+        distance, stage = _match(
+            query.values,
+            query.norms,
+            query.unit,
+            ref.values,
+            ref.norms,
+            ref.unit,
+            ref.min_norm,
+            sakoe_chiba_window(len(query), len(ref)),
+            best,
+        )
+        if stage == _PRUNED_KEOGH:
+            stats["keogh"] += 1
+            continue
+        stats["dtw"] += 1
+        if stage == _ABANDONED:
+            stats["abandoned"] += 1
+        elif distance < best:
+            best_label, best = label, distance
+    return best_label, best, stats
+
+
+@njit(cache=_CACHE, nogil=True, parallel=True)
+def _pairwise_dtw(q_vals, q_norms, q_offsets, r_vals, r_norms, r_offsets, pairs):
+    n_refs = len(r_offsets) - 1
+    out = np.empty(len(pairs))
+    for p in prange(len(pairs)):
+        qi, ri = pairs[p] // n_refs, pairs[p] % n_refs
+        q0, q1 = q_offsets[qi], q_offsets[qi + 1]
+        r0, r1 = r_offsets[ri], r_offsets[ri + 1]
+        n, m = q1 - q0, r1 - r0
+        if n == 0 or m == 0 or abs(n - m) > max(n, m) // 3:
+            out[p] = np.inf
+            continue
+        out[p] = _banded_dtw(
+            q_vals[q0:q1],
+            q_norms[q0:q1],
+            r_vals[r0:r1],
+            r_norms[r0:r1],
+            max(n, m) // 3,
+            np.inf,
+            np.zeros(n),
+        )
+    return out
+
+
+def _pack(sequences):
+    # Послідовності різної довжини склеюються в один масив зі зміщеннями
+    prepared = [prepare(seq) for seq in sequences]
+    lengths = np.array([len(seq) for seq in prepared], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+    non_empty = [seq for seq in prepared if len(seq)]
+    if non_empty:
+        values = np.ascontiguousarray(np.concatenate([seq.values for seq in non_empty]))
+        norms = np.concatenate([seq.norms for seq in non_empty])
+    else:
+        values, norms = np.zeros((0, 1)), np.zeros(0)
+    return values, norms, offsets, lengths
+
+
+def dtw_distance_matrix(queries, references):
+    """Відстані DTW між усіма парами (запит, еталон) однією операцією.
+
+    Повертає матрицю (len(queries), len(references)) з тими самими
+    значеннями, що й dtw_distance для кожної пари. prange ділить пари на
+    суцільні рівні шматки по одному на потік, тому пари, відсортовані за
+    вартістю, роздаються потокам по черзі: кожен отримує і важкі, і легкі.
+    Пари поза смугою Сакое-Чиби одразу отримують inf.
+    """
+    result = np.full((len(queries), len(references)), np.inf)
+    if not len(queries) or not len(references):
+        return result
+    q_vals, q_norms, q_offsets, q_lengths = _pack(queries)
+    r_vals, r_norms, r_offsets, r_lengths = _pack(references)
+    if q_vals.shape[1] != r_vals.shape[1] and len(q_vals) and len(r_vals):
+        raise ValueError("Запити та еталони мають різну кількість ознак")
+    cost = np.outer(q_lengths, r_lengths).ravel()
+    outside = np.abs(np.subtract.outer(q_lengths, r_lengths)).ravel() > (
+        np.maximum.outer(q_lengths, r_lengths).ravel() // 3
+    )
+    cost[outside] = 0  # Такі пари не рахуються
+    order = np.argsort(-cost, kind="stable").astype(np.int64)
+    # Шматок потоку t — пари t, t + n, t + 2n, ... у порядку спадання вартості
+    n_threads = get_num_threads()
+    pairs = np.concatenate([order[t::n_threads] for t in range(n_threads)])
+    distances = _pairwise_dtw(
+        q_vals, q_norms, q_offsets, r_vals, r_norms, r_offsets, pairs
+    )
+    result.ravel()[pairs] = distances
+    return result
+
+
+def _python_dtw(seq1, seq2):
+    # Попередня реалізація custom_dtw — лише для перевірки та порівняння швидкості
+    n, m = len(seq1), len(seq2)
+    window = max(n, m) // 3
+    cost_matrix = np.full((n + 1, m + 1), np.inf)
+    cost_matrix[0, 0] = 0
+    for i in range(1, n + 1):
+        j_min = max(1, i - window)
+        j_max = min(m + 1, i + window + 1)
+        for j in range(j_min, j_max):
+            dist = 1 - np.dot(seq1[i - 1], seq2[j - 1]) / (
+                np.linalg.norm(seq1[i - 1]) * np.linalg.norm(seq2[j - 1]) + 1e-8
+            )
+            cost_matrix[i, j] = dist + min(
+                cost_matrix[i - 1, j],
+                cost_matrix[i, j - 1],
+                cost_matrix[i - 1, j - 1],
+            )
+    return cost_matrix[n, m]
+
+
+def benchmark(n=200, m=200, n_features=61, repeats=5, seed=0):
+    """Порівнює швидкість і результати нового ядра з попереднім циклом на Python."""
+    import time
+
+    rng = np.random.default_rng(seed)
+    pairs = [
+        (
+            rng.standard_normal((n + k, n_features)),
+            rng.standard_normal((m - k, n_features)),
+        )
+        for k in range(repeats)
+    ]
+    dtw_distance(*pairs[0])  # Компіляція numba не входить у вимірювання
+
+    started = time.perf_counter()
+    fast = [dtw_distance(a, b) for a, b in pairs]
+    fast_time = (time.perf_counter() - started) / repeats
+
+    started = time.perf_counter()
+    slow = [_python_dtw(a, b) for a, b in pairs]
+    slow_time = (time.perf_counter() - started) / repeats
+
+    max_error = max(abs(a - b) for a, b in zip(fast, slow))
+    return {
+        "python_seconds": slow_time,
+        "numba_seconds": fast_time,
+        "speedup": slow_time / fast_time,
+        "max_abs_difference": max_error,
+    }
+
+
+if __name__ == "__main__":
+    result = benchmark()
+    print(
+        f"Python: {result['python_seconds'] * 1000:.1f} мс, "
+        f"numba: {result['numba_seconds'] * 1000:.3f} мс, "
+        f"прискорення x{result['speedup']:.0f}, "
+        f"макс. різниця {result['max_abs_difference']:.2e}"
+    )
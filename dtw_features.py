@@ -0,0 +1,74 @@
+# dtw_features.py
+import librosa
+import numpy as np
+
+N_FFT = 2048
+HOP_LENGTH = 512
+
+
+def pre_emphasis(signal, pre_emph=0.97):
+    return np.append(signal[0], signal[1:] - pre_emph * signal[:-1])
+
+
+def frame_count(n_samples):
+    # Стільки ж кадрів, скільки дає librosa з center=True
+    return 1 + n_samples // HOP_LENGTH
+
+
+def frame_range(start, end, n_frames):
+    """Кадри, центри яких лежать у відрізку відліків [start, end]."""
+    first = min(start // HOP_LENGTH, n_frames)
+    last = min(end // HOP_LENGTH + 1, n_frames)
+    return first, max(first, last)
+
+
+def feature_frames(y, sr, n_mfcc, block_frames=8192):
+    """Ненормалізовані ознаки всього сигналу за один прохід STFT.
+
+    Спектр рахується блоками по block_frames кадрів, тож пам'ять не
+    залежить від тривалості запису, а результат збігається з librosa.feature
+    для всього сигналу. Повертає масив (кадри, 3 * n_mfcc + 1):
+    MFCC, їх дельти першого й другого порядку та RMS-енергія.
+    """
+    y = pre_emphasis(librosa.util.normalize(y)).astype(np.float32, copy=False)
+    n_frames = frame_count(len(y))
+    # Доповнення нулями відтворює center=True, pad_mode="constant"
+    padded = np.pad(y, N_FFT // 2)
+    del y
+    mel_filters = librosa.filters.mel(sr=sr, n_fft=N_FFT)
+    log_mel = np.empty((mel_filters.shape[0], n_frames), dtype=np.float32)
+    energy = np.empty((1, n_frames), dtype=np.float32)
+    for first in range(0, n_frames, block_frames):
+        last = min(first + block_frames, n_frames)
+        chunk = padded[first * HOP_LENGTH : (last - 1) * HOP_LENGTH + N_FFT]
+        power = (
+            np.abs(
+                librosa.stft(chunk, n_fft=N_FFT, hop_length=HOP_LENGTH, center=False)
+            )
+            ** 2
+        )
+        # top_db застосовується нижче до всього файлу, а не до окремого блоку
+        log_mel[:, first:last] = librosa.power_to_db(mel_filters @ power, top_db=None)
+        energy[:, first:last] = librosa.feature.rms(
+            y=chunk, frame_length=N_FFT, hop_length=HOP_LENGTH, center=False
+        )
+    np.maximum(log_mel, log_mel.max() - 80.0, out=log_mel)
+
+    mfcc = librosa.feature.mfcc(S=log_mel, n_mfcc=n_mfcc)
+    delta_width = min(9, n_frames - (1 - n_frames % 2))
+    if delta_width >= 3:
+        delta_mfcc = librosa.feature.delta(mfcc, width=delta_width)
+        delta2_mfcc = librosa.feature.delta(mfcc, width=delta_width, order=2)
+    else:
+        delta_mfcc = delta2_mfcc = np.zeros_like(mfcc)  # Запис коротший за 3 кадри
+    return np.vstack([mfcc, delta_mfcc, delta2_mfcc, energy]).T
+
+
+def normalize_frames(frames):
+    """Нормалізує кожну ознаку в межах послідовності (нульове середнє, одинична дисперсія)."""
+    return (frames - np.mean(frames, axis=0)) / (np.std(frames, axis=0) + 1e-8)
+
+
+def extract_features(y, sr, n_mfcc):
+    """Нормалізовані ознаки окремого запису (наприклад, еталона)."""
+    return normalize_frames(feature_frames(y, sr, n_mfcc))
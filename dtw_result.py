@@ -1,6 +1,5 @@
 import os
-import numpy as np
-import librosa
+import time
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from PyQt6.QtWidgets import (
@@ -14,17 +13,21 @@ from PyQt6.QtWidgets import (
     QListWidgetItem,
     QFileDialog,
     QDoubleSpinBox,
+    QSpinBox,
+    QCheckBox,
 )
 from PyQt6.QtCore import Qt, QThread, QUrl, pyqtSignal
 from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
 
-from dtw_transcription import DTWTranscriptionWorker
+from audio_store import load_audio
+from instrumentation import timed
+from waveform_pyramid import WaveformPyramid
 
 
 class AudioLoadWorker(QThread):
     loaded = pyqtSignal(
-        str, object, int
-    )  # Сигнал для успішного завантаження: шлях, audio_data, sample_rate
+        str, object, int, object
+    )  # Сигнал для успішного завантаження: шлях, audio_data, sample_rate, обвідна
     error = pyqtSignal(str)  # Сигнал для помилки
 
     def __init__(self, file_path):
@@ -33,12 +36,64 @@ class AudioLoadWorker(QThread):
 
     def run(self):
         try:
-            audio_data, sample_rate = librosa.load(self.file_path, sr=None)
-            self.loaded.emit(self.file_path, audio_data, sample_rate)
+            # Декодоване аудіо спільне з DTW-обробкою того ж файлу
+            audio_data, sample_rate = load_audio(self.file_path)
+            # Обвідна для малювання будується тут, а не в потоці інтерфейсу
+            pyramid = WaveformPyramid(audio_data, sample_rate)
+            self.loaded.emit(self.file_path, audio_data, sample_rate, pyramid)
         except Exception as e:
             self.error.emit(str(e))
 
 
+class PlaybackCursor:
+    """Курсор відтворення, що перемальовується блітингом.
+
+    Статичний фон осей (хвиля, сегменти) запам'ятовується після кожного
+    повного малювання полотна, а на кожен крок відтворення відновлюється
+    фон і малюється лише лінія курсора. Оновлення частіше за max_fps
+    кадрів на секунду пропускаються.
+    """
+
+    def __init__(self, canvas, ax, max_fps=30):
+        self.canvas = canvas
+        self.ax = ax
+        self.min_interval = 1.0 / max_fps
+        self.position = 0.0
+        self.last_blit = 0.0
+        self.background = None
+        self.line = None
+        canvas.mpl_connect("draw_event", self.on_draw)
+
+    def attach(self):
+        # Після ax.clear() лінію потрібно створити заново
+        self.line = self.ax.axvline(
+            x=self.position, color="red", linestyle="--", linewidth=1, animated=True
+        )
+        self.background = None
+
+    def on_draw(self, event):
+        # Анімовані елементи не входять у повне малювання, тож фон чистий
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        if self.line is not None:
+            self.ax.draw_artist(self.line)
+
+    def move(self, position, force=False):
+        self.position = position
+        if self.line is None:
+            return
+        now = time.monotonic()
+        if not force and now - self.last_blit < self.min_interval:
+            return
+        self.last_blit = now
+        self.line.set_xdata([position, position])
+        if self.background is None:
+            self.canvas.draw_idle()  # Фон з'явиться після повного малювання
+            return
+        self.canvas.restore_region(self.background)
+        self.ax.draw_artist(self.line)
+        self.canvas.blit(self.ax.bbox)
+
+
 class DTWResultWindow(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -46,6 +101,7 @@ class DTWResultWindow(QWidget):
         self.file_path = None
         self.audio_data = None
         self.sample_rate = None
+        self.pyramid = None
         self.segments = []
         self.is_playing = False
         self.load_thread = None  # Додаємо для асинхронного завантаження
@@ -130,6 +186,31 @@ class DTWResultWindow(QWidget):
         )
         settings_layout.addWidget(self.min_pause_spin)
 
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, os.cpu_count() or 1)
+        self.workers_spin.setValue(os.cpu_count() or 1)
+        self.workers_spin.setPrefix("Потоків: ")
+        self.workers_spin.setToolTip(
+            "Скільки сегментів порівнювати з еталонами одночасно. "
+            "Типово — кількість ядер процесора."
+        )
+        settings_layout.addWidget(self.workers_spin)
+
+        self.spotting_checkbox = QCheckBox("Пошук ключових слів")
+        self.spotting_checkbox.setToolTip(
+            "Шукати еталонні слова безпосередньо в неперервному мовленні, "
+            "без поділу аудіо на сегменти за паузами. Налаштування пауз "
+            "у цьому режимі не використовуються."
+        )
+        settings_layout.addWidget(self.spotting_checkbox)
+
+        self.centroids_checkbox = QCheckBox("Центроїди слів")
+        self.centroids_checkbox.setToolTip(
+            "Порівнювати з усередненим шаблоном кожного слова (DBA) замість "
+            "усіх записів окремо. Швидше, коли записів на слово багато."
+        )
+        settings_layout.addWidget(self.centroids_checkbox)
+
         layout.addLayout(settings_layout)
 
         # Кнопка "Почати транскрибування"
@@ -168,6 +249,18 @@ class DTWResultWindow(QWidget):
         self.figure, self.ax = plt.subplots(figsize=(10, 2))
         self.canvas = FigureCanvas(self.figure)
         self.canvas.setStyleSheet("background-color: #222;")
+        self.canvas.setToolTip(
+            "Коліщатко миші — масштаб, перетягування — прокрутка, "
+            "подвійний клік — весь запис"
+        )
+        self.canvas.mpl_connect("scroll_event", self.on_waveform_scroll)
+        self.canvas.mpl_connect("button_press_event", self.on_waveform_press)
+        self.canvas.mpl_connect("motion_notify_event", self.on_waveform_drag)
+        self.canvas.mpl_connect("button_release_event", self.on_waveform_release)
+        self.canvas.mpl_connect("resize_event", self.on_waveform_resize)
+        self.waveform_line = None
+        self.pan_origin = None
+        self.cursor = PlaybackCursor(self.canvas, self.ax)
         layout.addWidget(self.canvas)
 
         # Прогрес
@@ -200,7 +293,6 @@ class DTWResultWindow(QWidget):
         self.transcription = []
         self.thread = None
         self.worker = None
-        self.playback_line = None
 
     def select_file(self):
         file_path, _ = QFileDialog.getOpenFileName(
@@ -235,9 +327,7 @@ class DTWResultWindow(QWidget):
         self.player.setSource(QUrl())  # Очищаємо джерело
         self.is_playing = False
         self.play_btn.setText("▶ Відтворити")
-        if self.playback_line:
-            self.playback_line.set_xdata([0, 0])
-            self.canvas.draw()
+        self.cursor.move(0.0, force=True)
 
     def cleanup_load_thread(self):
         if self.load_thread:
@@ -247,10 +337,12 @@ class DTWResultWindow(QWidget):
             self.load_thread.deleteLater()
             self.load_thread = None
 
-    def on_audio_loaded(self, file_path, audio_data, sample_rate):
+    def on_audio_loaded(self, file_path, audio_data, sample_rate, pyramid):
         self.file_path = file_path
         self.audio_data = audio_data
         self.sample_rate = sample_rate
+        self.pyramid = pyramid
+        self.segments = []
         self.file_label.setText(f"Файл: {os.path.basename(file_path)}")
         self.player.setSource(QUrl.fromLocalFile(file_path))
         self.start_btn.setEnabled(True)
@@ -268,22 +360,77 @@ class DTWResultWindow(QWidget):
         self.cleanup_load_thread()
 
     def load_and_plot_audio(self):
+        self.plot_waveform("Аудіохвиля")
+
+    def plot_waveform(self, title, xlim=None):
+        # Малюється обвідна з піраміди: точок стільки, скільки пікселів по ширині
         self.ax.clear()
-        time = np.linspace(
-            0, len(self.audio_data) / self.sample_rate, num=len(self.audio_data)
-        )
-        self.ax.plot(time, self.audio_data, color="#007bff")
-        self.ax.set_title("Аудіохвиля", color="white")
+        self.waveform_line = self.ax.plot([], [], color="#007bff", linewidth=0.8)[0]
+        for start, end in self.segments:
+            self.ax.axvspan(start, end, color="yellow", alpha=0.3)
+        low, high = self.pyramid.amplitude_range()
+        margin = 0.05 * (high - low) or 1.0
+        self.ax.set_ylim(low - margin, high + margin)
+        self.ax.set_xlim(xlim or (0, self.pyramid.duration))
+        self.ax.set_title(title, color="white")
         self.ax.set_xlabel("Час (с)", color="white")
         self.ax.set_ylabel("Амплітуда", color="white")
         self.ax.set_facecolor("#222")
         self.figure.set_facecolor("#121212")
         self.ax.tick_params(colors="white")
-        self.playback_line = self.ax.axvline(
-            x=0, color="red", linestyle="--", linewidth=1
-        )
+        self.cursor.attach()
+        self.refresh_waveform()
         self.canvas.draw()
 
+    def refresh_waveform(self):
+        if self.pyramid is None or self.waveform_line is None:
+            return
+        start, end = self.ax.get_xlim()
+        columns = max(1, int(self.ax.bbox.width))
+        self.waveform_line.set_data(*self.pyramid.polyline(start, end, columns))
+
+    def set_view(self, start, end):
+        # Видимий відрізок не виходить за межі запису й не коротший за 10 мс
+        duration = self.pyramid.duration
+        width = min(max(end - start, 0.01), duration)
+        start = min(max(start, 0.0), duration - width)
+        self.ax.set_xlim(start, start + width)
+        self.refresh_waveform()
+        self.canvas.draw_idle()
+
+    def on_waveform_scroll(self, event):
+        if self.pyramid is None or event.inaxes is not self.ax:
+            return
+        start, end = self.ax.get_xlim()
+        scale = 0.8 if event.button == "up" else 1.25
+        # Точка під курсором залишається на місці
+        self.set_view(
+            event.xdata - (event.xdata - start) * scale,
+            event.xdata + (end - event.xdata) * scale,
+        )
+
+    def on_waveform_press(self, event):
+        if self.pyramid is None or event.inaxes is not self.ax:
+            return
+        if event.dblclick:
+            self.set_view(0, self.pyramid.duration)
+        elif event.button == 1:
+            self.pan_origin = (event.x, self.ax.get_xlim())
+
+    def on_waveform_drag(self, event):
+        if self.pan_origin is None:
+            return
+        origin_x, (start, end) = self.pan_origin
+        # Зсув у пікселях, а не в даних: під час прокрутки вісь рухається
+        shift = (event.x - origin_x) * (end - start) / self.ax.bbox.width
+        self.set_view(start - shift, end - shift)
+
+    def on_waveform_release(self, event):
+        self.pan_origin = None
+
+    def on_waveform_resize(self, event):
+        self.refresh_waveform()
+
     def toggle_playback(self):
         if not self.is_playing:
             self.player.play()
@@ -293,30 +440,35 @@ class DTWResultWindow(QWidget):
             self.player.pause()
             self.play_btn.setText("▶ Відтворити")
             self.is_playing = False
+            # Останнє положення могло бути пропущене обмеженням частоти кадрів
+            self.cursor.move(self.player.position() / 1000.0, force=True)
 
     def update_playback_position(self, position):
         if self.audio_data is not None and self.sample_rate is not None:
-            current_time = position / 1000.0
-            self.playback_line.set_xdata([current_time, current_time])
-            self.canvas.draw()
+            self.cursor.move(position / 1000.0)
 
     def on_player_state_changed(self, state):
         if state == QMediaPlayer.PlaybackState.StoppedState:
             self.play_btn.setText("▶ Відтворити")
             self.is_playing = False
-            self.playback_line.set_xdata([0, 0])
-            self.canvas.draw()
+            self.cursor.move(0.0, force=True)
 
     def start_transcription_thread(self):
         if not self.file_path:
             return
         self.transcription_list.clear()
         self.export_btn.setEnabled(False)
+        # librosa і numba потрібні лише для обробки, не для відкриття вікна
+        from dtw_transcription import DTWTranscriptionWorker
+
         self.worker = DTWTranscriptionWorker(
             self.file_path,
             top_db=self.top_db_spin.value(),
             min_segment_length=self.min_segment_spin.value(),
             min_pause_length=self.min_pause_spin.value(),
+            workers=self.workers_spin.value(),
+            keyword_spotting=self.spotting_checkbox.isChecked(),
+            use_centroids=self.centroids_checkbox.isChecked(),
         )
         self.thread = QThread()
         self.worker.moveToThread(self.thread)
@@ -369,23 +521,8 @@ class DTWResultWindow(QWidget):
         self.cleanup_thread()
 
     def plot_segments(self):
-        self.ax.clear()
-        time = np.linspace(
-            0, len(self.audio_data) / self.sample_rate, num=len(self.audio_data)
-        )
-        self.ax.plot(time, self.audio_data, color="#007bff")
-        for start, end in self.segments:
-            self.ax.axvspan(start, end, color="yellow", alpha=0.3)
-        self.ax.set_title("Аудіохвиля з сегментами", color="white")
-        self.ax.set_xlabel("Час (с)", color="white")
-        self.ax.set_ylabel("Амплітуда", color="white")
-        self.ax.set_facecolor("#222")
-        self.figure.set_facecolor("#121212")
-        self.ax.tick_params(colors="white")
-        self.playback_line = self.ax.axvline(
-            x=0, color="red", linestyle="--", linewidth=1
-        )
-        self.canvas.draw()
+        # Поточний масштаб зберігається
+        self.plot_waveform("Аудіохвиля з сегментами", xlim=self.ax.get_xlim())
 
     def export_transcription(self):
         if not self.transcription:
@@ -394,11 +531,13 @@ class DTWResultWindow(QWidget):
             self, "Експортувати транскрипцію", "", "Text files (*.txt)"
         )
         if file_path:
-            with open(file_path, "w", encoding="utf-8") as f:
-                for segment in self.transcription:
-                    f.write(
-                        f"{segment['start']:.2f}s - {segment['end']:.2f}s: {segment['text']}\n"
-                    )
+            with timed("dtw", "export", file=self.file_path, output=file_path):
+                with open(file_path, "w", encoding="utf-8") as f:
+                    for segment in self.transcription:
+                        f.write(
+                            f"{segment['start']:.2f}s - {segment['end']:.2f}s: "
+                            f"{segment['text']}\n"
+                        )
 
     def back_to_main(self):
         if self.parent:
@@ -1,11 +1,26 @@
 import librosa
-import numpy as np
+import logging
 import os
 import sys
-import soundfile as sf
-import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from PyQt6.QtCore import QObject, pyqtSignal
 
+from audio_splitting import merge_intervals
+from audio_store import load_audio
+from dtw_engine import MAX_DTW_DISTANCE, PreparedSequence, search
+from dtw_features import (
+    HOP_LENGTH,
+    feature_frames,
+    frame_count,
+    frame_range,
+    normalize_frames,
+)
+from instrumentation import StageTimer
+from keyword_spotting import resolve_overlaps, spot_keywords
+from template_index import TemplateIndex
+
+logging.basicConfig(filename="transcription.log", level=logging.INFO, encoding="utf-8")
+
 
 def resource_path(relative_path):
     """Отримати абсолютний шлях до ресурсу, працює у dev та після білду."""
@@ -26,6 +41,10 @@ class DTWTranscriptionWorker(QObject):
         n_mfcc=20,
         min_segment_length=0.3,
         min_pause_length=0.4,
+        workers=None,
+        keyword_spotting=False,
+        use_centroids=False,
+        max_centroids=1,
     ):
         super().__init__()
         self.file_path = file_path
@@ -34,185 +53,198 @@ class DTWTranscriptionWorker(QObject):
         self.n_mfcc = n_mfcc
         self.min_segment_length = min_segment_length
         self.min_pause_length = min_pause_length
+        # Ядра DTW відпускають GIL, тож потоки справді працюють паралельно
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        # Пошук ключових слів у неперервному потоці замість сегментації
+        self.keyword_spotting = keyword_spotting
+        # DBA-центроїди замість окремих записів: вартість залежить від словника
+        self.use_centroids = use_centroids
+        self.max_centroids = max_centroids
         self.sr = None
+        self.pruning_stats = {}
+        self.timer = StageTimer("dtw")  # Замінюється на початку run()
 
-    def pre_emphasis(self, signal, pre_emph=0.97):
-        return np.append(signal[0], signal[1:] - pre_emph * signal[:-1])
-
-    def get_mfcc_sequence(self, file_path, n_mfcc):
-        try:
-            y, sr = librosa.load(file_path, sr=None)
-            if self.sr is None:
-                self.sr = sr
-            y = librosa.util.normalize(y)
-            y = self.pre_emphasis(y)
-            mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=n_mfcc)
-            energy = librosa.feature.rms(y=y)
-            delta_mfcc = librosa.feature.delta(mfcc)
-            delta2_mfcc = librosa.feature.delta(mfcc, order=2)
-            combined = np.vstack([mfcc, delta_mfcc, delta2_mfcc, energy]).T
-            combined = (combined - np.mean(combined, axis=0)) / (
-                np.std(combined, axis=0) + 1e-8
-            )
-            return combined
-        except Exception as e:
-            self.error.emit(f"Помилка вилучення MFCC: {str(e)}")
-            return None
-
-    def split_audio(self, file_path, top_db, min_duration, merge_threshold):
+    def split_audio(self, y, sr, top_db, min_duration, merge_threshold):
+        """Ділянки мовлення як діапазони відліків (start, end)."""
         try:
-            y, sr = librosa.load(file_path, sr=None)
-            if self.sr is None:
-                self.sr = sr
             intervals = librosa.effects.split(y, top_db=top_db)
-            merged_intervals = []
-
-            prev_start, prev_end = intervals[0]
-            for start, end in intervals[1:]:
-                pause = (start - prev_end) / sr
-                if pause < merge_threshold:
-                    energy_prev = librosa.feature.rms(y=y[prev_start:prev_end])[
-                        0
-                    ].mean()
-                    energy_curr = librosa.feature.rms(y=y[start:end])[0].mean()
-                    if abs(energy_prev - energy_curr) < 0.1:
-                        prev_end = end
-                    else:
-                        merged_intervals.append((prev_start, prev_end))
-                        prev_start, prev_end = start, end
-                else:
-                    merged_intervals.append((prev_start, prev_end))
-                    prev_start, prev_end = start, end
-            merged_intervals.append((prev_start, prev_end))
-
-            segments = []
-            for start, end in merged_intervals:
-                duration = (end - start) / sr
-                if duration >= min_duration:
-                    segments.append((y[start:end], start / sr, end / sr))
-            return segments, sr
+            # Сусідні ділянки з короткою паузою і близькою RMS-енергією
+            # об'єднуються за один скомпільований прохід
+            merged_intervals = merge_intervals(y, intervals, sr, merge_threshold)
+
+            return [
+                (int(start), int(end))
+                for start, end in merged_intervals
+                if (end - start) / sr >= min_duration
+            ]
         except Exception as e:
             self.error.emit(f"Помилка сегментації аудіо: {str(e)}")
-            return [], None
-
-    def custom_dtw(self, seq1, seq2, window=None):
-        try:
-            n, m = len(seq1), len(seq2)
-            window = max(n, m) // 3
-            cost_matrix = np.full((n + 1, m + 1), np.inf)
-            cost_matrix[0, 0] = 0
-
-            for i in range(1, n + 1):
-                j_min = max(1, i - window)
-                j_max = min(m + 1, i + window + 1)
-                for j in range(j_min, j_max):
-                    dist = 1 - np.dot(seq1[i - 1], seq2[j - 1]) / (
-                        np.linalg.norm(seq1[i - 1]) * np.linalg.norm(seq2[j - 1]) + 1e-8
-                    )
-                    cost_matrix[i, j] = dist + min(
-                        cost_matrix[i - 1, j],
-                        cost_matrix[i, j - 1],
-                        cost_matrix[i - 1, j - 1],
-                    )
-            return cost_matrix[n, m]
-        except Exception as e:
-            self.error.emit(f"Помилка в custom_dtw: {str(e)}")
-            return np.inf
+            return []
+
+    def load_templates(self):
+        """Шаблони для порівняння: слово -> список (назва, ознаки)."""
+        # Ознаки еталонів обчислюються один раз і зберігаються на диску
+        index = TemplateIndex(
+            resource_path(self.reference_folder), n_mfcc=self.n_mfcc
+        ).build(self.progress.emit)
+        if not self.use_centroids:
+            self.progress.emit(f"Завантажено еталонів: {len(index)}")
+            return index.templates
+        templates = index.centroids(self.max_centroids, self.progress.emit)
+        count = sum(len(entries) for entries in templates.values())
+        self.progress.emit(f"Еталонів: {len(index)}, центроїдів: {count}")
+        return templates
+
+    def spot_keywords(self, y, sr):
+        """Шукає входження еталонів у всьому файлі без сегментації на слова."""
+        import numba
+
+        self.timer.start("features")
+        self.progress.emit("Обчислюємо ознаки...")
+        frames = feature_frames(y, sr, self.n_mfcc)
+        self.timer.start("templates")
+        templates = self.load_templates()
+        self.timer.start("spotting")
+        numba.set_num_threads(min(self.workers, numba.config.NUMBA_NUM_THREADS))
+
+        def report(done, total, found):
+            self.progress.emit(
+                f"Пошук ключових слів: {done * 100 // total}% (збігів: {found})"
+            )
 
-    def compare_mfcc(self, seq1, seq2):
-        try:
-            distance = self.custom_dtw(seq1, seq2)
-            return distance
-        except Exception as e:
-            self.error.emit(f"Помилка порівняння MFCC: {str(e)}")
-            return float("inf")
+        hits = spot_keywords(
+            frames,
+            [
+                (word, ref_file, features)
+                for word, references in templates.items()
+                for ref_file, features in references
+            ],
+            progress_callback=report,
+        )
+        frame_seconds = HOP_LENGTH / sr
+        results = [
+            {
+                "start": hit["start_frame"] * frame_seconds,
+                "end": (hit["end_frame"] + 1) * frame_seconds,
+                "text": hit["word"],
+                "cost": hit["cost"],
+            }
+            for hit in resolve_overlaps(hits)
+        ]
+        logging.info(
+            f"Пошук ключових слів: {len(hits)} збігів, після усунення перекриттів "
+            f"{len(results)}"
+        )
+        return results
 
     def run(self):
+        # Час етапів запуску записується в журнал instrumentation.RUNS_LOG
+        self.timer = StageTimer(
+            "dtw",
+            file=self.file_path,
+            mode="spotting" if self.keyword_spotting else "segments",
+            centroids=self.use_centroids,
+            workers=self.workers,
+        )
         try:
+            # Файл декодується один раз; сегменти — діапазони в цьому сигналі
+            self.timer.start("load")
+            y, sr = load_audio(self.file_path)
+            self.sr = sr
+            self.timer.context["audio_seconds"] = round(len(y) / sr, 2)
+            if self.keyword_spotting:
+                results = self.spot_keywords(y, sr)
+                self.timer.finish(segments=len(results))
+                self.finished.emit(results)
+                self.progress.emit("Завершено")
+                return
+
+            self.timer.start("split")
             self.progress.emit("Сегментуємо аудіо...")
-            segments, sr = self.split_audio(
-                self.file_path,
+            segments = self.split_audio(
+                y,
+                sr,
                 top_db=self.top_db,
                 min_duration=self.min_segment_length,
                 merge_threshold=self.min_pause_length,
             )
             if not segments:
+                self.timer.finish("error", error="Не вдалося сегментувати аудіо")
                 self.error.emit("Не вдалося сегментувати аудіо")
                 return
 
             self.progress.emit(f"Знайдено {len(segments)} сегментів")
 
-            results = []
-            temp_files = []
-
-            # Абсолютний шлях до папки з референсами
-            ref_dir = resource_path(self.reference_folder)
-
-            word_references = {}
-            for ref_file in os.listdir(ref_dir):
-                if ref_file.endswith((".wav", ".mp3")):
-                    word = ref_file.split(".")[0].split("_")[0]
-                    word_references.setdefault(word, []).append(ref_file)
-
-            for i, (segment, start_time, end_time) in enumerate(segments):
-                self.progress.emit(f"Аналізуємо сегмент {i+1}/{len(segments)}")
-
-                # Створення тимчасового файлу
-                with tempfile.NamedTemporaryFile(
-                    delete=False, suffix=".wav"
-                ) as temp_file:
-                    segment_path = temp_file.name
-                    sf.write(segment_path, segment, sr)
-                    temp_files.append(segment_path)
-
-                input_mfcc_seq = self.get_mfcc_sequence(
-                    segment_path, n_mfcc=self.n_mfcc
+            # STFT, MFCC, дельти та RMS рахуються один раз для всього файлу
+            self.timer.start("features")
+            self.progress.emit("Обчислюємо ознаки...")
+            frames = feature_frames(y, sr, self.n_mfcc)
+            n_frames = frame_count(len(y))
+
+            self.timer.start("templates")
+            templates = self.load_templates()
+            candidates = [
+                (word, PreparedSequence(features))
+                for word, references in templates.items()
+                for _, features in references
+            ]
+            totals = {"candidates": 0, "kim": 0, "keogh": 0, "abandoned": 0, "dtw": 0}
+
+            def match_segment(start, end):
+                # Ознаки сегмента — нормалізований зріз кадрів усього файлу
+                first, last = frame_range(start, end, n_frames)
+                # Каскад LB_Kim -> LB_Keogh -> DTW з раннім припиненням
+                return search(
+                    normalize_frames(frames[first:last]),
+                    candidates,
+                    threshold=MAX_DTW_DISTANCE,
                 )
-                if input_mfcc_seq is None:
-                    results.append(
-                        {"start": start_time, "end": end_time, "text": "[unknown]"}
-                    )
-                    continue
-
-                min_distance = float("inf")
-                best_match = None
-
-                for word, ref_files in word_references.items():
-                    distances = []
-                    for ref_file in ref_files:
-                        ref_path = os.path.join(ref_dir, ref_file)
-                        ref_mfcc_seq = self.get_mfcc_sequence(
-                            ref_path, n_mfcc=self.n_mfcc
-                        )
-                        if ref_mfcc_seq is None:
-                            continue
-                        distance = self.compare_mfcc(input_mfcc_seq, ref_mfcc_seq)
-                        distances.append(distance)
-                        self.progress.emit(f"{ref_file}: DTW Distance = {distance:.2f}")
-                    if distances:
-                        distance = min(distances)
-                        if distance < 50 and distance < min_distance:
-                            min_distance = distance
-                            best_match = word
-
-                if best_match:
-                    results.append(
-                        {"start": start_time, "end": end_time, "text": best_match}
-                    )
+
+            self.progress.emit(
+                f"Аналізуємо {len(segments)} сегментів у {self.workers} потоках"
+            )
+            self.timer.start("matching")
+            results = [None] * len(segments)
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = {
+                    executor.submit(match_segment, start, end): i
+                    for i, (start, end) in enumerate(segments)
+                }
+                # Прогрес надсилається з цього потоку в міру готовності сегментів,
+                # а результати збираються в порядку сегментів
+                for done, future in enumerate(as_completed(futures), start=1):
+                    i = futures[future]
+                    start, end = segments[i]
+                    best_match, min_distance, stats = future.result()
+                    for key, value in stats.items():
+                        totals[key] += value
+                    results[i] = {
+                        "start": start / sr,
+                        "end": end / sr,
+                        "text": best_match or "[unknown]",
+                    }
+                    if best_match:
+                        match_text = f"{best_match} (DTW = {min_distance:.2f})"
+                    else:
+                        match_text = "збіг не знайдено"
                     self.progress.emit(
-                        f"Найкращий збіг: {best_match} (DTW = {min_distance:.2f})"
+                        f"Аналізуємо сегмент {done}/{len(segments)}: {match_text}; "
+                        f"повних DTW {stats['dtw'] - stats['abandoned']}/"
+                        f"{stats['candidates']}"
                     )
-                else:
-                    results.append(
-                        {"start": start_time, "end": end_time, "text": "[unknown]"}
-                    )
-                    self.progress.emit("Не вдалося знайти збіг")
-
-            for temp_file in temp_files:
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
 
+            self.pruning_stats = totals
+            summary = (
+                f"Пошук еталонів: кандидатів {totals['candidates']}, "
+                f"відсічено LB_Kim {totals['kim']}, LB_Keogh {totals['keogh']}, "
+                f"перервано DTW {totals['abandoned']}, "
+                f"повних DTW {totals['dtw'] - totals['abandoned']}"
+            )
+            logging.info(summary)
+            self.timer.finish(segments=len(results), pruning=totals)
+            self.progress.emit(summary)
             self.finished.emit(results)
             self.progress.emit("Завершено")
         except Exception as e:
+            self.timer.finish("error", error=str(e))
             self.error.emit(f"Помилка транскрибування: {str(e)}")
@@ -0,0 +1,274 @@
+# instrumentation.py
+import argparse
+import datetime
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+RUNS_LOG = os.path.abspath(os.path.join("cache", "runs.jsonl"))
+# Як часто (с) вимірюється поточна пам'ять під час етапу
+RSS_SAMPLE_INTERVAL = 0.05
+
+_write_lock = threading.Lock()
+
+
+def peak_rss_mb():
+    """Піковий обсяг пам'яті процесу (МБ) за весь час роботи або None."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux повертає кілобайти, macOS — байти
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    return None
+
+
+def current_rss_mb():
+    """Поточний обсяг пам'яті процесу (МБ) або None."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class _RssSampler(threading.Thread):
+    """Найбільша поточна пам'ять за час одного етапу."""
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = current_rss_mb()
+        self._stopped = threading.Event()
+        if self.peak is not None:
+            self.start()
+
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is not None and rss > self.peak:
+            self.peak = rss
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self._sample()
+
+    def stop(self):
+        if self.peak is None:
+            return None
+        self._stopped.set()
+        self.join()
+        self._sample()
+        return self.peak
+
+
+class StageTimer:
+    """Час етапів одного запуску: настінний, процесорний і пікова пам'ять.
+
+    Етап триває від start(назва) до наступного start() або finish(), тож
+    лінійний конвеєр розмічається одним викликом на етап. finish() дописує
+    запуск одним JSON-рядком у log_path; незавершений таймер нічого не пише.
+    Процесорний час — усього процесу (всі потоки, без дочірніх процесів).
+    peak_rss_mb етапу — найбільша пам'ять, виміряна фоновим потоком під час
+    етапу; peak_rss_mb запуску — найбільша з етапів, а process_peak_rss_mb —
+    піковий обсяг процесу за весь час його роботи.
+    """
+
+    def __init__(self, engine, log_path=RUNS_LOG, **context):
+        self.engine = engine
+        self.log_path = log_path
+        self.context = context
+        self.stages = []
+        self.current = None
+        self.started = (time.perf_counter(), time.process_time())
+
+    def start(self, stage):
+        if self.current and self.current[0] == stage:
+            return  # Повторне повідомлення про той самий етап
+        self.stop()
+        self.current = (stage, time.perf_counter(), time.process_time(), _RssSampler())
+
+    def stop(self):
+        if self.current is None:
+            return
+        stage, wall, cpu, sampler = self.current
+        peak = sampler.stop()
+        self.stages.append(
+            {
+                "stage": stage,
+                "wall": round(time.perf_counter() - wall, 4),
+                "cpu": round(time.process_time() - cpu, 4),
+                "peak_rss_mb": None if peak is None else round(peak, 1),
+            }
+        )
+        self.current = None
+
+    def finish(self, status="done", **extra):
+        self.stop()
+        wall, cpu = self.started
+        peaks = [s["peak_rss_mb"] for s in self.stages if s["peak_rss_mb"]]
+        process_peak = peak_rss_mb()
+        record = {
+            "engine": self.engine,
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "status": status,
+            **self.context,
+            **extra,
+            "wall": round(time.perf_counter() - wall, 4),
+            "cpu": round(time.process_time() - cpu, 4),
+            "peak_rss_mb": max(peaks) if peaks else None,
+            "process_peak_rss_mb": (
+                None if process_peak is None else round(process_peak, 1)
+            ),
+            "stages": self.stages,
+        }
+        stages = ", ".join(f"{s['stage']} {s['wall']:.2f} с" for s in self.stages)
+        logging.info(f"{self.engine}: {status} за {record['wall']:.2f} с ({stages})")
+        try:
+            os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+            with _write_lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError:
+            pass  # Вимірювання не повинні зривати обробку
+        return record
+
+
+class NullTimer:
+    """Таймер, що нічого не вимірює: для викликів без журналу запусків."""
+
+    def __init__(self):
+        self.context = {}
+
+    def start(self, stage):
+        pass
+
+    def stop(self):
+        pass
+
+    def finish(self, status="done", **extra):
+        return None
+
+
+@contextmanager
+def timed(engine, stage, **context):
+    """Окремий запуск з одного етапу, наприклад експорт результату."""
+    timer = StageTimer(engine, kind=stage, **context)
+    timer.start(stage)
+    try:
+        yield timer
+    except BaseException as e:
+        timer.finish("error", error=str(e))
+        raise
+    timer.finish()
+
+
+def load_runs(path=RUNS_LOG, engine=None):
+    runs = []
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    run = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Обірваний рядок після аварійного завершення
+                if engine is None or run.get("engine") == engine:
+                    runs.append(run)
+    return runs
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def summarize(runs):
+    """Статистика по рушіях і етапах: (рушій, етап) -> словник показників."""
+    groups = {}
+    for run in runs:
+        engine = run.get("engine")
+        # У запуску з одного етапу (kind) підсумок збігається з самим етапом
+        rows = [] if run.get("kind") else [("(усього)", run)]
+        rows += [(s["stage"], s) for s in run.get("stages", [])]
+        for stage, row in rows:
+            groups.setdefault((engine, stage), []).append(row)
+        if run.get("audio_seconds"):
+            groups.setdefault((engine, "(RTF)"), []).append(
+                {"wall": run["wall"] / run["audio_seconds"], "cpu": None}
+            )
+    summary = {}
+    for key, rows in groups.items():
+        walls = [row["wall"] for row in rows]
+        cpus = [row["cpu"] for row in rows if row.get("cpu") is not None]
+        peaks = [row["peak_rss_mb"] for row in rows if row.get("peak_rss_mb")]
+        summary[key] = {
+            "count": len(rows),
+            "wall_median": _percentile(walls, 0.5),
+            "wall_p90": _percentile(walls, 0.9),
+            "cpu_median": _percentile(cpus, 0.5) if cpus else None,
+            "peak_rss_mb": max(peaks) if peaks else None,
+        }
+    return summary
+
+
+def print_summary(summary, out=sys.stdout):
+    print(
+        f"{'Рушій':<10}{'Етап':<16}{'Запусків':>9}{'Медіана, с':>12}"
+        f"{'P90, с':>10}{'CPU, с':>10}{'Пам., МБ':>10}",
+        file=out,
+    )
+    for (engine, stage), row in sorted(summary.items(), key=lambda item: item[0]):
+        cpu = "-" if row["cpu_median"] is None else f"{row['cpu_median']:.2f}"
+        peak = "-" if row["peak_rss_mb"] is None else f"{row['peak_rss_mb']:.0f}"
+        print(
+            f"{str(engine):<10}{stage:<16}{row['count']:>9}"
+            f"{row['wall_median']:>12.2f}{row['wall_p90']:>10.2f}"
+            f"{cpu:>10}{peak:>10}",
+            file=out,
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Зведення часу етапів транскрибування з журналу запусків"
+    )
+    parser.add_argument("log", nargs="?", default=RUNS_LOG)
+    parser.add_argument("--engine", choices=["whisper", "dtw"])
+    parser.add_argument("--last", type=int, help="Лише останні N запусків")
+    parser.add_argument(
+        "--status", default="done", help="Враховувати запуски з цим статусом"
+    )
+    args = parser.parse_args(argv)
+
+    runs = [
+        run
+        for run in load_runs(args.log, args.engine)
+        if run.get("status") == args.status
+    ]
+    if args.last:
+        runs = runs[-args.last :]
+    if not runs:
+        print("Немає запусків у журналі", file=sys.stderr)
+        return 1
+    print_summary(summarize(runs))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,40 @@
 # interface.py
+import time
+
+STARTED = time.perf_counter()  # Відлік часу запуску — до всіх інших імпортів
+
+import datetime
+import json
+import logging
+import os
 import sys
 from PyQt6.QtWidgets import QApplication, QMainWindow, QStackedWidget
 from PyQt6.QtGui import QIcon
+from PyQt6.QtCore import QTimer
 from main_window import MainWindow
-from config_window import ConfigWindow
-from result_window import ResultWindow
-from dtw_result import DTWResultWindow
+from config_window import ConfigWindow, CudaProbe
+
+# result_window (whisper, torch) і dtw_result (librosa, matplotlib)
+# імпортуються в switch_to_*, коли вікно відкривають уперше
+
+STARTUP_LOG = os.path.abspath(os.path.join("cache", "startup.jsonl"))
+
+
+def report_startup(stages):
+    """Записує тривалість етапів запуску (с від старту процесу) у STARTUP_LOG."""
+    record = {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "frozen": bool(getattr(sys, "frozen", False)),
+        **{name: round(seconds, 3) for name, seconds in stages.items()},
+    }
+    try:
+        os.makedirs(os.path.dirname(STARTUP_LOG), exist_ok=True)
+        with open(STARTUP_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError:
+        pass  # Звіт не повинен заважати запуску
+    summary = ", ".join(f"{name} {seconds:.2f} с" for name, seconds in stages.items())
+    logging.info(f"Запуск: {summary}")
 
 
 class Interface(QMainWindow):
@@ -28,6 +57,17 @@ class Interface(QMainWindow):
         self.stack.addWidget(self.main_window)
         self.showMaximized()
 
+        # Перевірка CUDA імпортує torch, тому йде у фоні після показу вікна
+        self.cuda_available = None
+        self.cuda_probe = CudaProbe(self)
+        self.cuda_probe.detected.connect(self.on_cuda_detected)
+        self.cuda_probe.start()
+
+    def on_cuda_detected(self, available):
+        self.cuda_available = available
+        if self.config_window:
+            self.config_window.set_cuda_available(available)
+
     def switch_to_config(self, file_path=None):
         if not self.config_window:
             self.config_window = ConfigWindow(self, file_path)
@@ -36,18 +76,24 @@ class Interface(QMainWindow):
             self.config_window.set_file_path(file_path)
         self.stack.setCurrentWidget(self.config_window)
 
-    def switch_to_result(self, file_path, model_name, language, device):
+    def switch_to_result(self, file_path, model_name, language, device, vad=False):
         if not self.result_window:
+            from result_window import ResultWindow
+
             self.result_window = ResultWindow(
-                self, file_path, model_name, language, device
+                self, file_path, model_name, language, device, vad
             )
             self.stack.addWidget(self.result_window)
         else:
-            self.result_window.update_content(file_path, model_name, language, device)
+            self.result_window.update_content(
+                file_path, model_name, language, device, vad
+            )
         self.stack.setCurrentWidget(self.result_window)
 
     def switch_to_hmm_result(self):
         if not self.hmm_result_window:
+            from dtw_result import DTWResultWindow
+
             self.hmm_result_window = DTWResultWindow(self)
             self.stack.addWidget(self.hmm_result_window)
         self.stack.setCurrentWidget(self.hmm_result_window)
@@ -55,9 +101,24 @@ class Interface(QMainWindow):
     def switch_to_main(self):
         self.stack.setCurrentWidget(self.main_window)
 
+    def closeEvent(self, event):
+        # Запущений QThread не можна знищувати разом із вікном; імпорт torch
+        # перервати неможливо, тож дочікуємося кінця перевірки
+        self.cuda_probe.wait()
+        super().closeEvent(event)
+
 
 if __name__ == "__main__":
+    stages = {"imports": time.perf_counter() - STARTED}
     app = QApplication(sys.argv)
     window = Interface()
     window.show()
+    stages["window"] = time.perf_counter() - STARTED
+    # Спрацьовує, щойно цикл подій обробив показ вікна, тобто після першого кадру
+    QTimer.singleShot(
+        0,
+        lambda: report_startup(
+            {**stages, "first_frame": time.perf_counter() - STARTED}
+        ),
+    )
     sys.exit(app.exec())
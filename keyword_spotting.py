@@ -0,0 +1,243 @@
+# keyword_spotting.py
+import numpy as np
+from numba import njit, prange
+
+from dtw_engine import _CACHE, _FASTMATH, PreparedSequence
+
+# Середня косинусна відстань на кадр еталона, нижче якої збіг вважається входженням
+SPOTTING_THRESHOLD = 0.5
+
+
+def local_normalize(frames, window):
+    """Нормалізує ознаки потоку за ковзним вікном window кадрів навколо кожного кадру.
+
+    Еталони нормалізуються по всьому слову, тож потік приводиться до
+    порівнянного масштабу локально, а не по всьому файлу.
+    """
+    frames = np.asarray(frames, dtype=np.float64)
+    n = len(frames)
+    if n == 0:
+        return frames
+    half = max(1, window // 2)
+    sums = np.concatenate([np.zeros((1, frames.shape[1])), np.cumsum(frames, axis=0)])
+    squares = np.concatenate(
+        [np.zeros((1, frames.shape[1])), np.cumsum(frames * frames, axis=0)]
+    )
+    lo = np.maximum(np.arange(n) - half, 0)
+    hi = np.minimum(np.arange(n) + half + 1, n)
+    count = (hi - lo)[:, None]
+    mean = (sums[hi] - sums[lo]) / count
+    var = np.maximum((squares[hi] - squares[lo]) / count - mean * mean, 0.0)
+    return (frames - mean) / (np.sqrt(var) + 1e-8)
+
+
+@njit(cache=_CACHE, nogil=True, parallel=True, fastmath=_FASTMATH)
+def _spot_block(
+    x_vals,
+    x_norms,
+    t0,
+    tpl_vals,
+    tpl_norms,
+    tpl_offsets,
+    costs,
+    starts,
+    candidates,
+    threshold,
+    min_ratio,
+    max_ratio,
+    hits,
+    hit_counts,
+):
+    n_templates = len(tpl_offsets) - 1
+    dims = x_vals.shape[1]
+    for k in prange(n_templates):
+        o0, o1 = tpl_offsets[k], tpl_offsets[k + 1]
+        m = o1 - o0
+        # costs/starts[o0 + k : o1 + k + 1] — стовпець накопиченої вартості
+        # шаблону k (m + 1 рядків, рядок 0 — відкритий початок)
+        base = o0 + k
+        count = 0
+        for b in range(x_vals.shape[0]):
+            t = t0 + b
+            diag_cost, diag_start = 0.0, t
+            up_cost, up_start = 0.0, t
+            for i in range(1, m + 1):
+                left_cost = costs[base + i]
+                left_start = starts[base + i]
+                best_cost, best_start = diag_cost, diag_start
+                if up_cost < best_cost:
+                    best_cost, best_start = up_cost, up_start
+                if left_cost < best_cost:
+                    best_cost, best_start = left_cost, left_start
+                dot = 0.0
+                for d in range(dims):
+                    dot += tpl_vals[o0 + i - 1, d] * x_vals[b, d]
+                dist = 1.0 - dot / (tpl_norms[o0 + i - 1] * x_norms[b] + 1e-8)
+                diag_cost, diag_start = left_cost, left_start
+                costs[base + i] = dist + best_cost
+                starts[base + i] = best_start
+                up_cost, up_start = costs[base + i], best_start
+
+            # Відкритий кінець: шлях може завершитися на будь-якому кадрі
+            score = costs[base + m] / m
+            start = starts[base + m]
+            length = t - start + 1
+            valid = score < threshold and min_ratio * m <= length <= max_ratio * m
+            # candidates[k] = (вартість, початок, кінець) найкращого збігу поточної серії
+            open_hit = candidates[k, 2] >= 0
+            if open_hit and (not valid or start > candidates[k, 2]):
+                # Серія закінчилася або почалося нове входження — фіксуємо збіг
+                hits[k, count, 0] = candidates[k, 0]
+                hits[k, count, 1] = candidates[k, 1]
+                hits[k, count, 2] = candidates[k, 2]
+                count += 1
+                candidates[k, 2] = -1.0
+                open_hit = False
+            if valid and (not open_hit or score < candidates[k, 0]):
+                candidates[k, 0] = score
+                candidates[k, 1] = start
+                candidates[k, 2] = t
+        hit_counts[k] = count
+
+
+class KeywordSpotter:
+    """Пошук входжень еталонів у неперервному потоці ознак (subsequence DTW).
+
+    Кожен еталон вирівнюється з потоком з відкритим початком і кінцем, тож
+    сегментація на слова не потрібна. Потік подається блоками через feed():
+    стан DTW зберігається між блоками, а знайдені входження повертаються,
+    щойно їхня серія збігів завершилася. Входження — словник з ключами
+    word, reference, start_frame, end_frame, cost (середня відстань на кадр
+    еталона).
+    """
+
+    def __init__(
+        self,
+        templates,
+        threshold=SPOTTING_THRESHOLD,
+        min_ratio=0.5,
+        max_ratio=2.0,
+    ):
+        # templates — список (слово, ім'я файлу, ознаки)
+        self.labels = [(word, ref_file) for word, ref_file, _ in templates]
+        prepared = [PreparedSequence(features) for _, _, features in templates]
+        lengths = np.array([len(seq) for seq in prepared], dtype=np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        self.values = np.ascontiguousarray(np.concatenate([s.values for s in prepared]))
+        self.norms = np.concatenate([s.norms for s in prepared])
+        self.threshold = float(threshold)
+        self.min_ratio = float(min_ratio)
+        self.max_ratio = float(max_ratio)
+
+        size = int(self.offsets[-1]) + len(prepared)
+        self.costs = np.full(size, np.inf)
+        self.starts = np.zeros(size, dtype=np.int64)
+        self.candidates = np.zeros((len(prepared), 3))
+        self.candidates[:, 2] = -1.0
+        self.position = 0
+
+    def _collect(self, hits, counts):
+        found = []
+        for k, count in enumerate(counts):
+            word, ref_file = self.labels[k]
+            for cost, start, end in hits[k, :count]:
+                found.append(
+                    {
+                        "word": word,
+                        "reference": ref_file,
+                        "start_frame": int(start),
+                        "end_frame": int(end),
+                        "cost": float(cost),
+                    }
+                )
+        return found
+
+    def feed(self, frames):
+        """Обробляє наступний блок кадрів і повертає завершені входження."""
+        frames = np.ascontiguousarray(frames, dtype=np.float64)
+        if len(frames) == 0:
+            return []
+        norms = np.linalg.norm(frames, axis=1)
+        hits = np.zeros((len(self.labels), len(frames), 3))
+        counts = np.zeros(len(self.labels), dtype=np.int64)
+        _spot_block(
+            frames,
+            norms,
+            self.position,
+            self.values,
+            self.norms,
+            self.offsets,
+            self.costs,
+            self.starts,
+            self.candidates,
+            self.threshold,
+            self.min_ratio,
+            self.max_ratio,
+            hits,
+            counts,
+        )
+        self.position += len(frames)
+        return self._collect(hits, counts)
+
+    def finish(self):
+        """Повертає входження, серії яких тривали до кінця потоку."""
+        found = []
+        for k, (cost, start, end) in enumerate(self.candidates):
+            if end >= 0:
+                word, ref_file = self.labels[k]
+                found.append(
+                    {
+                        "word": word,
+                        "reference": ref_file,
+                        "start_frame": int(start),
+                        "end_frame": int(end),
+                        "cost": float(cost),
+                    }
+                )
+        self.candidates[:, 2] = -1.0
+        return found
+
+
+def resolve_overlaps(hits, max_overlap=0.5):
+    """Залишає найдешевші входження, відкидаючи ті, що суттєво їх перекривають."""
+    kept = []
+    for hit in sorted(hits, key=lambda h: h["cost"]):
+        length = hit["end_frame"] - hit["start_frame"] + 1
+        overlaps = False
+        for other in kept:
+            shared = min(hit["end_frame"], other["end_frame"]) - max(
+                hit["start_frame"], other["start_frame"]
+            )
+            shorter = min(length, other["end_frame"] - other["start_frame"] + 1)
+            if shared + 1 > max_overlap * shorter:
+                overlaps = True
+                break
+        if not overlaps:
+            kept.append(hit)
+    return sorted(kept, key=lambda h: h["start_frame"])
+
+
+def spot_keywords(
+    frames,
+    templates,
+    threshold=SPOTTING_THRESHOLD,
+    block_frames=2048,
+    norm_window=100,
+    progress_callback=None,
+):
+    """Один лінійний прохід потоку ознак: усі входження всіх еталонів.
+
+    progress_callback(оброблено_кадрів, усього_кадрів, знайдено_входжень)
+    викликається після кожного блоку.
+    """
+    spotter = KeywordSpotter(templates, threshold=threshold)
+    frames = local_normalize(frames, norm_window)
+    hits = []
+    for first in range(0, len(frames), block_frames):
+        hits.extend(spotter.feed(frames[first : first + block_frames]))
+        if progress_callback:
+            progress_callback(
+                min(first + block_frames, len(frames)), len(frames), len(hits)
+            )
+    hits.extend(spotter.finish())
+    return hits
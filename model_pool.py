@@ -0,0 +1,257 @@
+# model_pool.py
+import gc
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import torch
+import whisper
+
+MODELS_DIR = os.path.abspath("models")
+
+# Бюджет пам'яті та час простою можна перевизначити через змінні середовища
+DEFAULT_RAM_BUDGET_MB = int(os.environ.get("WHISPER_POOL_RAM_MB", "4096"))
+DEFAULT_IDLE_TIMEOUT = float(os.environ.get("WHISPER_POOL_IDLE_TIMEOUT", "600"))
+
+
+# Псевдопристрій: CPU з динамічною int8-квантизацією лінійних шарів
+QUANTIZED_DEVICE = "cpu-int8"
+
+
+def model_size_bytes(model):
+    """Приблизний обсяг пам'яті, який займають ваги та буфери моделі."""
+    size = 0
+    # state_dict містить і упаковані ваги квантизованих шарів (у кортежах)
+    for value in model.state_dict().values():
+        for tensor in value if isinstance(value, tuple) else (value,):
+            if isinstance(tensor, torch.Tensor):
+                size += tensor.numel() * tensor.element_size()
+    return size
+
+
+def quantized_model_path(model_name):
+    return os.path.join(MODELS_DIR, f"{model_name}-int8.pt")
+
+
+def quantize_model(model):
+    for module in model.modules():
+        # whisper.model.Linear лише приводить ваги до dtype входу, тож у fp32
+        # на CPU він еквівалентний nn.Linear, який вміє квантизувати torch
+        if isinstance(module, whisper.model.Linear):
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def load_quantized_model(model_name):
+    """Завантажує int8-версію моделі, квантизуючи її лише за першого запуску."""
+    path = quantized_model_path(model_name)
+    if os.path.exists(path):
+        try:
+            return torch.load(path, map_location="cpu", weights_only=False)
+        except Exception as e:
+            logging.warning(f"Не вдалося прочитати {path}, квантизуємо заново: {e}")
+
+    model = whisper.load_model(model_name, device="cpu", download_root=MODELS_DIR)
+    started = time.perf_counter()
+    model = quantize_model(model.eval())
+    logging.info(
+        f"Модель {model_name} квантизована до int8 за "
+        f"{time.perf_counter() - started:.2f} с"
+    )
+    temp_path = f"{path}.{os.getpid()}.part"
+    torch.save(model, temp_path)
+    os.replace(temp_path, path)
+    return model
+
+
+def load_whisper_model(model_name, device):
+    os.environ["WHISPER_MODELS_DIR"] = MODELS_DIR
+    if device == QUANTIZED_DEVICE:
+        return load_quantized_model(model_name)
+    return whisper.load_model(model_name, device=device, download_root=MODELS_DIR)
+
+
+class _PoolEntry:
+    def __init__(self, model, size):
+        self.model = model
+        self.size = size
+        self.last_used = time.monotonic()
+        self.users = 0
+        # transcribe() ставить власні перехоплювачі kv-кешу на декодер, тож
+        # одночасно модель може використовувати лише один виклик
+        self.in_use = threading.RLock()
+
+
+class ModelPool:
+    """Пул "теплих" моделей Whisper, ключ — (model_name, device).
+
+    Моделі залишаються в пам'яті між запусками. Якщо сумарний розмір
+    перевищує бюджет, витісняються найдавніше використані моделі, а моделі,
+    що простоюють довше за idle_timeout, вивантажуються фоновим потоком.
+    Моделі, які зараз використовуються, ніколи не витісняються.
+    """
+
+    def __init__(
+        self,
+        ram_budget_mb=DEFAULT_RAM_BUDGET_MB,
+        idle_timeout=DEFAULT_IDLE_TIMEOUT,
+        loader=load_whisper_model,
+    ):
+        self.ram_budget = int(ram_budget_mb * 1024 * 1024)
+        self.idle_timeout = idle_timeout
+        self.loader = loader
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._key_locks = {}
+        self._reaper = None
+        self._reaper_wakeup = threading.Event()
+
+    def configure(self, ram_budget_mb=None, idle_timeout=None):
+        with self._lock:
+            if ram_budget_mb is not None:
+                self.ram_budget = int(ram_budget_mb * 1024 * 1024)
+            if idle_timeout is not None:
+                self.idle_timeout = idle_timeout
+            self._evict_over_budget()
+        self._reaper_wakeup.set()
+
+    def is_loaded(self, model_name, device="cpu"):
+        with self._lock:
+            return (model_name, device) in self._entries
+
+    def loaded_models(self):
+        with self._lock:
+            return list(self._entries.keys())
+
+    def total_size(self):
+        with self._lock:
+            return sum(entry.size for entry in self._entries.values())
+
+    @contextmanager
+    def use_model(self, model_name, device="cpu"):
+        """Видає модель з пулу, завантажуючи її лише за першого звернення.
+
+        Поки блок with виконується, інші запити тієї самої моделі чекають.
+        """
+        key = (model_name, device)
+        entry = self._acquire(key)
+        try:
+            with entry.in_use:
+                yield entry.model
+        finally:
+            with self._lock:
+                entry.users -= 1
+                entry.last_used = time.monotonic()
+                self._evict_over_budget()
+
+    def _acquire(self, key):
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Окреме блокування на ключ: паралельні запити однієї моделі
+        # чекають одне завантаження, а інші моделі видаються без затримки
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    entry.users += 1
+                    entry.last_used = time.monotonic()
+                    return entry
+
+            started = time.perf_counter()
+            model = self.loader(*key)
+            entry = _PoolEntry(model, model_size_bytes(model))
+            logging.info(
+                f"Модель {key[0]} ({key[1]}) завантажена за "
+                f"{time.perf_counter() - started:.2f} с, "
+                f"{entry.size / 1024 / 1024:.0f} МБ"
+            )
+
+            with self._lock:
+                entry.users += 1
+                self._entries[key] = entry
+                self._evict_over_budget()
+            self._ensure_reaper()
+            return entry
+
+    def unload(self, model_name, device="cpu"):
+        with self._lock:
+            entry = self._entries.pop((model_name, device), None)
+        if entry is not None:
+            self._release_memory(model_name, device, entry)
+
+    def clear(self):
+        with self._lock:
+            entries = list(self._entries.items())
+            self._entries.clear()
+        for (model_name, device), entry in entries:
+            self._release_memory(model_name, device, entry)
+
+    def _evict_over_budget(self):
+        # Викликається під self._lock
+        total = sum(entry.size for entry in self._entries.values())
+        for key in list(self._entries.keys()):
+            if total <= self.ram_budget:
+                break
+            entry = self._entries[key]
+            if entry.users > 0:
+                continue
+            del self._entries[key]
+            total -= entry.size
+            logging.info(f"Модель {key[0]} ({key[1]}) витіснена з пулу (бюджет RAM)")
+            self._release_memory(key[0], key[1], entry)
+
+    def _release_memory(self, model_name, device, entry):
+        entry.model = None
+        gc.collect()
+        if str(device).startswith("cuda") and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        logging.info(f"Модель {model_name} ({device}) вивантажена")
+
+    def _ensure_reaper(self):
+        with self._lock:
+            if self._reaper is not None and self._reaper.is_alive():
+                return
+            self._reaper = threading.Thread(
+                target=self._reap_idle, name="whisper-pool-reaper", daemon=True
+            )
+            self._reaper.start()
+
+    def _reap_idle(self):
+        while True:
+            self._reaper_wakeup.wait(timeout=max(1.0, min(self.idle_timeout, 60.0)))
+            self._reaper_wakeup.clear()
+            now = time.monotonic()
+            with self._lock:
+                expired = [
+                    (key, entry)
+                    for key, entry in self._entries.items()
+                    if entry.users == 0 and now - entry.last_used >= self.idle_timeout
+                ]
+                for key, _ in expired:
+                    del self._entries[key]
+                # Порожній пул не потребує фонового потоку
+                stop = not self._entries
+                if stop:
+                    self._reaper = None
+            for (model_name, device), entry in expired:
+                self._release_memory(model_name, device, entry)
+            if stop:
+                return
+
+
+_default_pool = ModelPool()
+
+
+def get_pool():
+    return _default_pool
+
+
+def use_model(model_name, device="cpu"):
+    return _default_pool.use_model(model_name, device)
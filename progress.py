@@ -0,0 +1,99 @@
+# progress.py
+import time
+
+# Етапи транскрибування
+CACHE = "cache"
+LOADING = "loading"
+VAD = "vad"
+LANGUAGE = "language"
+TRANSCRIBING = "transcribing"
+DONE = "done"
+CANCELLED = "cancelled"
+ERROR = "error"
+
+
+def format_duration(seconds):
+    minutes, secs = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02}:{secs:02}"
+    return f"{minutes}:{secs:02}"
+
+
+class ProgressReporter:
+    """Структуровані події прогресу транскрибування.
+
+    Подія — словник з ключами stage (один з етапів вище), message (текст
+    для користувача), processed і total (секунди аудіо, пройдені декодером,
+    і всього), percent (None, поки обсяг роботи невідомий), rtf (секунди
+    обробки на секунду аудіо) та eta (оцінка секунд до завершення).
+    Текст кожного етапу також передається в message_callback.
+    """
+
+    def __init__(self, message_callback=None, event_callback=None, clock=None):
+        self.message_callback = message_callback
+        self.event_callback = event_callback
+        self.clock = clock or time.perf_counter
+        self.current = None
+        self.message = ""
+        self.decode_started = None
+        self.processed = 0.0
+        self.total = 0.0
+
+    def stage(self, stage, message):
+        self.current = stage
+        self.message = message
+        if stage == TRANSCRIBING:
+            self.decode_started = self.clock()
+        if self.message_callback:
+            self.message_callback(message)
+        self._emit()
+
+    def position(self, processed, total):
+        """Позиція декодера в секундах аудіо."""
+        if self.decode_started is None:
+            self.decode_started = self.clock()
+        self.processed = processed
+        self.total = total
+        self._emit()
+
+    def percent(self):
+        if self.current == DONE:
+            return 100.0
+        if self.decode_started is None or self.total <= 0:
+            return None
+        return min(100.0, 100.0 * self.processed / self.total)
+
+    def _emit(self):
+        if not self.event_callback:
+            return
+        rtf = eta = None
+        if self.decode_started is not None and self.processed > 0:
+            rtf = (self.clock() - self.decode_started) / self.processed
+            eta = rtf * max(0.0, self.total - self.processed)
+        self.event_callback(
+            {
+                "stage": self.current,
+                "message": self.message,
+                "processed": self.processed,
+                "total": self.total,
+                "percent": self.percent(),
+                "rtf": rtf,
+                "eta": eta,
+            }
+        )
+
+
+def describe(event):
+    """Підпис до події: етап, пройдено / всього, швидкість і залишок часу."""
+    text = event["message"]
+    if event["stage"] == TRANSCRIBING and event["total"] > 0:
+        text = text.rstrip(".") + (
+            f": {format_duration(event['processed'])}"
+            f" / {format_duration(event['total'])}"
+        )
+        if event["rtf"] is not None:
+            text += f", RTF {event['rtf']:.2f}"
+        if event["eta"] is not None:
+            text += f", залишилось ~{format_duration(event['eta'])}"
+    return text
@@ -0,0 +1,164 @@
+# result_cache.py
+import hashlib
+import json
+import logging
+import os
+import threading
+
+CACHE_DIR = os.path.abspath(os.path.join("cache", "transcriptions"))
+DEFAULT_MAX_MB = int(os.environ.get("TRANSCRIPTION_CACHE_MB", "512"))
+# Версія формату записів: змінюється, якщо змінюється структура сегментів
+CACHE_VERSION = 1
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Кеш результатів транскрибування на диску, адресований вмістом файлу.
+
+    Ключ — хеш вмісту аудіо разом із моделлю, мовою, пристроєм та опціями
+    декодування, тож перейменований або скопійований файл теж знаходиться.
+    Розмір кешу обмежений: при переповненні видаляються записи, які найдовше
+    не читалися.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_mb=DEFAULT_MAX_MB):
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._digests_path = os.path.join(directory, "digests.json")
+        self._digests = None
+
+    def _read_digests(self):
+        try:
+            with open(self._digests_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _load_digests(self):
+        if self._digests is None:
+            self._digests = self._read_digests()
+        return self._digests
+
+    def content_digest(self, file_path):
+        """Хеш вмісту файлу; для незміненого файлу береться з індексу без читання."""
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        with self._lock:
+            known = self._load_digests().get(path)
+            if known and known[:2] == stamp:
+                return known[2]
+
+        digest = file_digest(path)
+        with self._lock:
+            # Індекс спільний для пакетних процесів: перед записом зливаємо його
+            # з версією на диску, щоб не стерти чужі записи своєю старою копією
+            for known_path, entry in self._read_digests().items():
+                mine = self._digests.get(known_path)
+                # Для кожного файлу лишається запис із новішим часом зміни
+                if mine is None or entry[1] > mine[1]:
+                    self._digests[known_path] = entry
+            self._digests[path] = stamp + [digest]
+            try:
+                self._write_json(self._digests_path, self._digests)
+            except OSError as e:
+                logging.warning(f"Не вдалося оновити індекс кешу: {e}")
+        return digest
+
+    def key(self, file_path, model_name, language, device, options=None):
+        payload = json.dumps(
+            {
+                "version": CACHE_VERSION,
+                "audio": self.content_digest(file_path),
+                "model": model_name,
+                "language": language,
+                "device": device,
+                "options": options or {},
+            },
+            sort_keys=True,
+        )
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=20).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                segments = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)  # Позначаємо запис як нещодавно використаний
+        except OSError:
+            pass
+        return segments
+
+    def put(self, key, segments):
+        path = self._entry_path(key)
+        with self._lock:
+            self._write_json(path, segments)
+            self._evict(keep=path)
+
+    def _write_json(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Тимчасове ім'я з pid: пакетні процеси можуть писати кеш одночасно
+        temp_path = f"{path}.{os.getpid()}.part"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def _evict(self, keep=None):
+        entries = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                if path in (self._digests_path, keep) or not name.endswith(".json"):
+                    continue
+                # Інший процес міг видалити запис між os.walk і os.stat
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        if keep is not None:
+            try:
+                total += os.path.getsize(keep)
+            except OSError:
+                pass
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # Уже видалений іншим процесом, місце однаково звільнено
+            except OSError:
+                continue
+            total -= size
+            logging.info(f"Запис кешу {os.path.basename(path)} видалено (ліміт розміру)")
+
+    def clear(self):
+        with self._lock:
+            for root, _, names in os.walk(self.directory):
+                for name in names:
+                    if name.endswith(".json"):
+                        os.remove(os.path.join(root, name))
+            self._digests = {}
+
+
+_default_cache = ResultCache()
+
+
+def get_cache():
+    return _default_cache
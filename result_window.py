@@ -16,34 +16,53 @@ from PyQt6.QtMultimediaWidgets import QVideoWidget
 from PyQt6.QtGui import QFont
 from PyQt6.QtCore import Qt, QUrl, QThread, pyqtSignal, QObject
 from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
-from transcription import transcribe_audio
+from cancellation import CancellationToken
+from instrumentation import timed
+from progress import CANCELLED, ERROR, describe
+
+# Скільки чекати зупинки потоку транскрибування під час закриття (мс)
+STOP_WAIT_MS = 5000
 
 
 class TranscriptionWorker(QObject):
-    progress = pyqtSignal(str)
+    progress = pyqtSignal(dict)  # Подія прогресу (progress.ProgressReporter)
+    segment = pyqtSignal(dict)  # Сегмент, щойно декодований моделлю
     finished = pyqtSignal(list)
     error = pyqtSignal(str)
 
-    def __init__(self, file_path, model_name, language, device):
+    def __init__(self, file_path, model_name, language, device, vad=False):
         super().__init__()
         self.file_path = file_path
         self.model_name = model_name
         self.language = language
         self.device = device
+        self.vad = vad
         self._stop_requested = False
+        self.cancel_token = CancellationToken()
 
-    # def stop(self):
-    #     self._stop_requested = True  # Метод для встановлення прапора зупинки (хоча тут не використовується через відсутність підтримки в transcribe_audio)
+    def stop(self):
+        # Викликається з GUI-потоку; transcribe_audio перевіряє прапорець
+        # між кроками декодера і повертає вже отримані сегменти
+        self._stop_requested = True
+        self.cancel_token.cancel()
 
     def run(self):
         try:
+            # whisper і torch імпортуються в робочому потоці, а не під час запуску
+            from transcription import transcribe_audio
+
             transcription = transcribe_audio(
                 self.file_path,
                 self.model_name,
                 self.language,
                 self.device,
-                self.update_progress,
+                segment_callback=self.segment.emit,
+                event_callback=self.update_progress,
+                cancel_token=self.cancel_token,
+                vad=self.vad,
             )
+            if self._stop_requested:
+                return  # Вікно вже скинуло стан, результат нікому не потрібен
             if "error" in transcription:
                 self.error.emit(transcription["error"])
             else:
@@ -51,19 +70,26 @@ class TranscriptionWorker(QObject):
         except Exception as e:
             self.error.emit(f"Помилка під час транскрибування: {str(e)}")
 
-    def update_progress(self, message):
+    def update_progress(self, event):
         if not self._stop_requested:  # Оновлюємо прогрес лише, якщо не зупинено
-            self.progress.emit(message)
+            self.progress.emit(event)
 
 
 class ResultWindow(QWidget):
-    def __init__(self, parent, file_path, model_name, language, device):
+    def __init__(self, parent, file_path, model_name, language, device, vad=False):
         super().__init__()
         self.parent = parent
         self.file_path = file_path
         self.model_name = model_name
         self.language = language
         self.device = device
+        self.vad = vad
+        # Зупинені потоки, що дообробляють поточний крок у фоні
+        self.stopping_threads = []
+        # Вікно живе в стеку головного вікна і не отримує closeEvent при виході
+        app = QApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.wait_stopped_threads)
         self.is_video = file_path.lower().endswith((".mp4", ".mkv", ".avi", ".mov"))
         self.setStyleSheet(
             "background-color: #121212; color: white; font-family: Arial, sans-serif;"
@@ -310,40 +336,77 @@ class ResultWindow(QWidget):
         )
 
         if file_path:
-            if selected_filter == "Text files (*.txt)" or file_path.endswith(".txt"):
-                self.save_as_text(file_path)
-            elif selected_filter == "SRT files (*.srt)" or file_path.endswith(".srt"):
-                self.save_as_srt(file_path)
+            with timed("whisper", "export", file=self.file_path, output=file_path):
+                self.save_transcription(file_path, selected_filter)
+
+    def save_transcription(self, file_path, selected_filter):
+        if selected_filter == "Text files (*.txt)" or file_path.endswith(".txt"):
+            self.save_as_text(file_path)
+        elif selected_filter == "SRT files (*.srt)" or file_path.endswith(".srt"):
+            self.save_as_srt(file_path)
 
     def start_transcription_thread(self):
         if hasattr(self, "thread") and isinstance(self.thread, QThread):
             if self.thread.isRunning():
-                # if hasattr(self, "worker") and self.worker:
-                #     self.worker.stop()
-                self.thread.quit()
-                self.thread.wait(100)  # Зменшуємо час очікування до 100 мс
-                if (
-                    self.thread.isRunning()
-                ):  # Якщо потік ще працює, примусово завершуємо
-                    self.thread.terminate()
-                    self.thread.wait()  # Чекаємо завершення після terminate
-                self.thread.deleteLater()  # Видаляємо старий потік
-                self.worker.deleteLater()  # Видаляємо старого воркера
+                self.stop_transcription_thread()
 
         self.worker = TranscriptionWorker(
-            self.file_path, self.model_name, self.language, self.device
+            self.file_path, self.model_name, self.language, self.device, self.vad
         )
         self.thread = QThread()
         self.worker.moveToThread(self.thread)
         self.worker.progress.connect(self.update_progress)
+        self.worker.segment.connect(self.on_segment_decoded)
         self.worker.finished.connect(self.on_transcription_finished)
         self.worker.error.connect(self.on_transcription_error)
         self.thread.started.connect(self.worker.run)
         self.thread.finished.connect(self.cleanup_thread)
         self.thread.start()
 
+    def stop_transcription_thread(self):
+        """Просить воркера зупинитися, не чекаючи завершення потоку.
+
+        Потік дообробляє поточний крок у фоні; його пізні сигнали відкидає
+        перевірка sender(), а ресурси звільняються за сигналом finished.
+        """
+        thread, worker = self.thread, self.worker
+        self.thread = None
+        self.worker = None
+        if thread is None:
+            return
+        if worker:
+            worker.stop()
+        thread.finished.disconnect(self.cleanup_thread)
+        # Посилання тримаємо до кінця потоку, інакше Python знищить його запущеним
+        stopped = (thread, worker)
+        self.stopping_threads.append(stopped)
+        thread.finished.connect(lambda: self.release_stopped_thread(stopped))
+        thread.quit()
+
+    def wait_stopped_threads(self):
+        """Зупиняє і дочікується всіх потоків перед закриттям.
+
+        Qt аварійно завершує процес, якщо знищується запущений QThread.
+        """
+        if isinstance(self.thread, QThread) and self.thread.isRunning():
+            self.stop_transcription_thread()
+        for thread, worker in list(self.stopping_threads):
+            if worker:
+                worker.stop()
+            thread.quit()
+            thread.wait(STOP_WAIT_MS)
+
+    def release_stopped_thread(self, stopped):
+        thread, worker = stopped
+        self.stopping_threads.remove(stopped)
+        thread.deleteLater()
+        if worker:
+            worker.deleteLater()
+
     def cleanup_thread(self):
-        """Очищаємо ресурси після завершення або переривання потоку."""
+        """Очищаємо ресурси після завершення потоку."""
+        if isinstance(self.sender(), QThread) and self.sender() is not self.thread:
+            return  # Потік, який уже очищено раніше
         if hasattr(self, "thread") and self.thread:
             self.thread.quit()
             self.thread.wait()
@@ -353,36 +416,57 @@ class ResultWindow(QWidget):
         self.thread = None
         self.worker = None
 
-    def update_progress(self, message):
-        self.progress_label.setText(f"Прогрес обробки: {message}")
-        if "Завантаження" in message:
-            self.progress_bar.setValue(20)
-        elif "Автоматичне" in message:
-            self.progress_bar.setValue(40)
-        elif "Транскрибування" in message:
-            self.progress_bar.setValue(60)
-        elif "Завершено" in message:
-            self.progress_bar.setValue(100)
-        elif "Помилка" in message:
-            self.progress_bar.setValue(0)
+    def update_progress(self, event):
+        if self.worker is None or self.sender() is not self.worker:
+            return
+        self.progress_label.setText(f"Прогрес обробки: {describe(event)}")
+        if event["stage"] in (ERROR, CANCELLED):
+            self.set_progress(0)
+        elif event["percent"] is None:
+            # Завантаження моделі й визначення мови: тривалість невідома
+            self.progress_bar.setRange(0, 0)
+        else:
+            self.set_progress(event["percent"])
+
+    def set_progress(self, percent):
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(int(percent))
+
+    def add_segment_item(self, segment):
+        start_pos = len(
+            str(self.transcription_list.count())
+        )  # Позиція для відстеження
+        segment_text = f"{segment['time']} {segment['text']}"
+        item = QListWidgetItem(segment_text)
+        item.setFont(QFont("Arial", 14))
+        self.transcription_list.addItem(item)
+        segment["start_pos"] = start_pos  # Зберігаємо позицію для виділення
+        segment["length"] = len(segment_text)
+
+    def on_segment_decoded(self, segment):
+        # Сигнали зупиненого воркера можуть надійти вже після скидання вікна
+        if self.worker is None or self.sender() is not self.worker:
+            return
+        self.transcription.append(segment)
+        self.add_segment_item(segment)
+        self.export_btn.setEnabled(True)
 
     def on_transcription_finished(self, transcription):
-        self.transcription = transcription
-        self.transcription_list.clear()  # Очищаємо список перед оновленням
-        for segment in transcription:
-            start_pos = len(
-                str(self.transcription_list.count())
-            )  # Позиція для відстеження
-            segment_text = f"{segment['time']} {segment['text']}"
-            item = QListWidgetItem(segment_text)
-            item.setFont(QFont("Arial", 14))
-            self.transcription_list.addItem(item)
-            segment["start_pos"] = start_pos  # Зберігаємо позицію для виділення
-            segment["length"] = len(segment_text)
+        if self.worker is None or self.sender() is not self.worker:
+            return
+        # Сегменти вже показані по мірі декодування; перебудовуємо список лише
+        # тоді, коли результат прийшов іншим шляхом
+        if len(transcription) != len(self.transcription):
+            self.transcription = transcription
+            self.transcription_list.clear()  # Очищаємо список перед оновленням
+            for segment in transcription:
+                self.add_segment_item(segment)
         self.cleanup_thread()  # Очищаємо ресурси після завершення
         self.export_btn.setEnabled(True)
 
     def on_transcription_error(self, error):
+        if self.worker is None or self.sender() is not self.worker:
+            return
         self.transcription_list.addItem(QListWidgetItem(f"Помилка: {error}"))
         self.cleanup_thread()  # Очищаємо ресурси після помилки
 
@@ -435,12 +519,13 @@ class ResultWindow(QWidget):
         self.speed_label.setText(f"{new_speed:.2f}x")
         self.player.setPlaybackRate(new_speed)
 
-    def update_content(self, file_path, model_name, language, device):
+    def update_content(self, file_path, model_name, language, device, vad=False):
         self.reset()
         self.file_path = file_path
         self.model_name = model_name
         self.language = language
         self.device = device
+        self.vad = vad
         self.is_video = file_path.lower().endswith((".mp4", ".mkv", ".avi", ".mov"))
         # print(f"Updated is_video: {self.is_video}")
         self.setup_media()
@@ -451,8 +536,9 @@ class ResultWindow(QWidget):
         self.model_name = None
         self.language = None
         self.device = None
+        self.vad = False
         self.is_video = False
-        self.progress_bar.setValue(0)
+        self.set_progress(0)
         self.transcription_list.clear()
         self.transcription = []
         self.player.stop()
@@ -467,20 +553,9 @@ class ResultWindow(QWidget):
         # Очищаємо ресурси потоку, якщо вони існують
         if hasattr(self, "thread") and self.thread:
             if self.thread.isRunning():
-                # if hasattr(self, "worker") and self.worker:
-                #     self.worker.stop()
-                self.thread.quit()
-                self.thread.wait(100)  # Зменшуємо час очікування до 100 мс
-                if (
-                    self.thread.isRunning()
-                ):  # Якщо потік ще працює, примусово завершуємо
-                    self.thread.terminate()
-                    self.thread.wait()  # Чекаємо завершення після terminate
-            self.thread.deleteLater()
-            self.thread = None
-        if hasattr(self, "worker") and self.worker:
-            self.worker.deleteLater()
-            self.worker = None
+                self.stop_transcription_thread()
+            else:
+                self.cleanup_thread()
 
         # Видаляємо медіа віджет, якщо він існує
         if hasattr(self, "media_widget") and self.media_widget:
@@ -518,34 +593,13 @@ class ResultWindow(QWidget):
                 QMessageBox.StandardButton.No,
             )
             if reply == QMessageBox.StandardButton.Yes:
-                # if hasattr(self, "worker") and self.worker:
-                #     self.worker.stop()
-                if hasattr(self, "thread") and self.thread:
-                    self.thread.quit()
-                    self.thread.wait(100)  # Зменшуємо час очікування до 100 мс
-                    if (
-                        self.thread.isRunning()
-                    ):  # Якщо потік ще працює, примусово завершуємо
-                        self.thread.terminate()
-                        self.thread.wait()  # Чекаємо завершення після terminate
-                    self.cleanup_thread()  # Очищаємо ресурси
+                self.stop_transcription_thread()
                 self.progress_label.setText("Прогрес обробки: Перервано")
-                self.progress_bar.setValue(0)
+                self.set_progress(0)
                 return True
             return False
         return True
 
-    def cleanup_thread(self):
-        """Очищаємо ресурси після завершення або переривання потоку."""
-        if hasattr(self, "thread") and self.thread:
-            self.thread.quit()
-            self.thread.wait()
-            self.thread.deleteLater()
-        if hasattr(self, "worker") and self.worker:
-            self.worker.deleteLater()
-        self.thread = None
-        self.worker = None
-
     def back_to_config(self):
         if self.confirm_interrupt_transcription():
             self.reset()
@@ -556,6 +610,7 @@ class ResultWindow(QWidget):
             event.ignore()
         else:
             self.reset()
+            self.wait_stopped_threads()
             event.accept()
 
 
@@ -0,0 +1,187 @@
+# template_index.py
+import hashlib
+import logging
+import os
+
+import librosa
+import numpy as np
+
+from dba import word_centroids
+from dtw_features import extract_features
+
+TEMPLATE_DIR = os.path.abspath(os.path.join("cache", "templates"))
+REFERENCE_EXTENSIONS = (".wav", ".mp3")
+# Змінюється разом зі зміною набору чи обчислення ознак
+INDEX_VERSION = 2
+# Змінюється разом зі зміною алгоритму побудови центроїдів
+CENTROID_VERSION = 1
+CENTROID_PREFIX = "centroids_"
+
+
+def reference_word(ref_file):
+    return ref_file.split(".")[0].split("_")[0]
+
+
+class TemplateIndex:
+    """Ознаки еталонних записів, обчислені один раз і збережені на диску.
+
+    Для кожного еталона зберігається окремий .npz, ім'я якого залежить від
+    шляху, розміру, часу зміни файлу та n_mfcc, тож перераховуються лише
+    змінені записи. Після build() усі ознаки тримаються в пам'яті.
+    """
+
+    def __init__(self, reference_dir, n_mfcc=20, directory=TEMPLATE_DIR):
+        self.reference_dir = os.path.abspath(reference_dir)
+        self.n_mfcc = n_mfcc
+        folder = hashlib.blake2b(
+            self.reference_dir.encode("utf-8"), digest_size=8
+        ).hexdigest()
+        self.directory = os.path.join(directory, f"{folder}_{n_mfcc}")
+        # Слово -> список (ім'я файлу, ознаки)
+        self.templates = {}
+        self._entries = []
+
+    def _entry_name(self, ref_path):
+        stat = os.stat(ref_path)
+        payload = "|".join(
+            [
+                ref_path,
+                str(stat.st_size),
+                str(stat.st_mtime_ns),
+                str(self.n_mfcc),
+                str(INDEX_VERSION),
+            ]
+        )
+        digest = hashlib.blake2b(payload.encode("utf-8"), digest_size=16)
+        return f"{digest.hexdigest()}.npz"
+
+    def _load_or_extract(self, ref_path, entry_path):
+        if os.path.exists(entry_path):
+            try:
+                with np.load(entry_path) as data:
+                    return data["features"]
+            except (OSError, ValueError, KeyError):
+                logging.warning(f"Пошкоджений запис індексу {entry_path}, перераховуємо")
+
+        y, sr = librosa.load(ref_path, sr=None)
+        features = extract_features(y, sr, self.n_mfcc)
+        temp_path = f"{entry_path}.{os.getpid()}.part"
+        with open(temp_path, "wb") as f:
+            np.savez(f, features=features)
+        os.replace(temp_path, entry_path)
+        return features
+
+    def build(self, progress_callback=None):
+        """Завантажує ознаки всіх еталонів, обчислюючи відсутні чи застарілі."""
+        os.makedirs(self.directory, exist_ok=True)
+        ref_files = sorted(
+            name
+            for name in os.listdir(self.reference_dir)
+            if name.endswith(REFERENCE_EXTENSIONS)
+        )
+        templates = {}
+        used = set()
+        for i, ref_file in enumerate(ref_files):
+            if progress_callback:
+                progress_callback(f"Завантаження еталонів {i + 1}/{len(ref_files)}")
+            ref_path = os.path.join(self.reference_dir, ref_file)
+            entry_name = self._entry_name(ref_path)
+            used.add(entry_name)
+            try:
+                features = self._load_or_extract(
+                    ref_path, os.path.join(self.directory, entry_name)
+                )
+            except Exception as e:
+                logging.error(f"Не вдалося вилучити ознаки {ref_file}: {e}")
+                if progress_callback:
+                    progress_callback(f"{ref_file}: не вдалося вилучити ознаки")
+                continue
+            templates.setdefault(reference_word(ref_file), []).append(
+                (ref_file, features)
+            )
+
+        # Записи змінених або видалених еталонів більше не потрібні
+        for name in os.listdir(self.directory):
+            if name.startswith(CENTROID_PREFIX):
+                continue
+            if name.endswith(".npz") and name not in used:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+        self.templates = templates
+        self._entries = sorted(used)
+        return self
+
+    def centroids(self, max_centroids=1, progress_callback=None):
+        """DBA-центроїди записів кожного слова (викликається після build()).
+
+        Повертає словник у форматі templates: слово -> список (назва, ознаки),
+        де на слово припадає не більше max_centroids шаблонів. Центроїди
+        зберігаються на диску й перераховуються лише після зміни еталонів.
+        """
+        payload = "|".join(
+            self._entries + [str(max_centroids), str(CENTROID_VERSION)]
+        )
+        digest = hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+        prefix = f"{CENTROID_PREFIX}{max_centroids}_"
+        path = os.path.join(self.directory, f"{prefix}{digest}.npz")
+
+        if os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    words = [str(word) for word in data["words"]]
+                    parts = np.split(data["features"], np.cumsum(data["lengths"])[:-1])
+                result = {}
+                for word, features in zip(words, parts):
+                    entries = result.setdefault(word, [])
+                    entries.append((f"{word}#dba{len(entries) + 1}", features))
+                return result
+            except (OSError, ValueError, KeyError):
+                logging.warning(f"Пошкоджений файл центроїдів {path}, перераховуємо")
+
+        result = {}
+        for i, (word, references) in enumerate(self.templates.items()):
+            if progress_callback:
+                progress_callback(
+                    f"Тренування центроїдів {i + 1}/{len(self.templates)}: {word}"
+                )
+            sequences = [features for _, features in references]
+            result[word] = [
+                (f"{word}#dba{k + 1}", centroid)
+                for k, centroid in enumerate(
+                    word_centroids(sequences, max_centroids=max_centroids)
+                )
+            ]
+
+        words, lengths, features = [], [], []
+        for word, entries in result.items():
+            for _, centroid in entries:
+                words.append(word)
+                lengths.append(len(centroid))
+                features.append(centroid)
+        temp_path = f"{path}.{os.getpid()}.part"
+        with open(temp_path, "wb") as f:
+            np.savez(
+                f,
+                words=np.array(words),
+                lengths=np.array(lengths, dtype=np.int64),
+                features=np.concatenate(features) if features else np.zeros((0, 1)),
+            )
+        os.replace(temp_path, path)
+        # Застарілі центроїди з тією ж кількістю шаблонів на слово
+        current = os.path.basename(path)
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name.endswith(".npz") and name != current:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+        return result
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.templates.values())
+
+    def items(self):
+        return self.templates.items()
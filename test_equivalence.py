@@ -0,0 +1,188 @@
+# test_equivalence.py
+# Швидкі реалізації мають давати ті самі результати, що й код, який вони замінили
+import librosa
+import numpy as np
+import pytest
+
+from audio_splitting import merge_intervals, speech_regions
+from dtw_engine import (
+    PreparedSequence,
+    _python_dtw,
+    dtw_distance,
+    dtw_distance_matrix,
+    search,
+)
+from dtw_features import extract_features, feature_frames, normalize_frames
+from keyword_spotting import spot_keywords
+from waveform_pyramid import WaveformPyramid
+
+SR = 16000
+
+
+def _speech_like(seconds=4.0, seed=0):
+    """Тональні сплески різної гучності, розділені паузами різної довжини."""
+    rng = np.random.default_rng(seed)
+    y = rng.standard_normal(int(seconds * SR)).astype(np.float32) * 1e-4
+    t = np.arange(int(0.25 * SR)) / SR
+    position = int(0.2 * SR)
+    while position + len(t) < len(y):
+        amplitude = rng.uniform(0.05, 0.8)
+        y[position : position + len(t)] += amplitude * np.sin(
+            2 * np.pi * rng.uniform(150, 600) * t
+        )
+        position += len(t) + int(rng.uniform(0.05, 0.6) * SR)
+    return y
+
+
+def _merge_reference(y, intervals, sr, merge_threshold):
+    # Попередній цикл DTWTranscriptionWorker.split_audio
+    merged = []
+    prev_start, prev_end = intervals[0]
+    for start, end in intervals[1:]:
+        pause = (start - prev_end) / sr
+        if pause < merge_threshold:
+            energy_prev = librosa.feature.rms(y=y[prev_start:prev_end])[0].mean()
+            energy_curr = librosa.feature.rms(y=y[start:end])[0].mean()
+            if abs(energy_prev - energy_curr) < 0.1:
+                prev_end = end
+            else:
+                merged.append((prev_start, prev_end))
+                prev_start, prev_end = start, end
+        else:
+            merged.append((prev_start, prev_end))
+            prev_start, prev_end = start, end
+    merged.append((prev_start, prev_end))
+    return merged
+
+
+def _features_reference(y, sr, n_mfcc):
+    # Попередній DTWTranscriptionWorker.get_mfcc_sequence без читання файлу
+    y = librosa.util.normalize(y)
+    y = np.append(y[0], y[1:] - 0.97 * y[:-1])
+    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=n_mfcc)
+    energy = librosa.feature.rms(y=y)
+    delta_mfcc = librosa.feature.delta(mfcc)
+    delta2_mfcc = librosa.feature.delta(mfcc, order=2)
+    combined = np.vstack([mfcc, delta_mfcc, delta2_mfcc, energy]).T
+    return (combined - np.mean(combined, axis=0)) / (np.std(combined, axis=0) + 1e-8)
+
+
+def _random_sequences(count, low, high, n_features=13, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        rng.standard_normal((int(n), n_features))
+        for n in rng.integers(low, high, count)
+    ]
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("merge_threshold", [0.1, 0.4, 1.0])
+def test_merge_intervals_matches_librosa_loop(seed, merge_threshold):
+    y = _speech_like(seed=seed)
+    intervals = librosa.effects.split(y, top_db=30)
+    expected = _merge_reference(y, intervals, SR, merge_threshold)
+    merged = merge_intervals(y, intervals, SR, merge_threshold)
+    assert [tuple(map(int, row)) for row in merged] == expected
+
+
+def test_extract_features_matches_librosa():
+    y = _speech_like(seconds=3.0)
+    expected = _features_reference(y, SR, 20)
+    features = extract_features(y, SR, 20)
+    assert features.shape == expected.shape
+    np.testing.assert_allclose(features, expected, atol=1e-3)
+
+
+def test_feature_blocks_do_not_change_result():
+    y = _speech_like(seconds=3.0, seed=3)
+    whole = feature_frames(y, SR, 20)
+    blocked = feature_frames(y, SR, 20, block_frames=7)
+    np.testing.assert_allclose(
+        normalize_frames(blocked), normalize_frames(whole), atol=1e-4
+    )
+
+
+def test_dtw_distance_matches_python_loop():
+    pairs = zip(_random_sequences(6, 5, 40), _random_sequences(6, 5, 40, seed=1))
+    for seq1, seq2 in pairs:
+        assert dtw_distance(seq1, seq2) == pytest.approx(_python_dtw(seq1, seq2))
+
+
+def test_distance_matrix_matches_pairwise():
+    queries = _random_sequences(9, 5, 60)
+    references = _random_sequences(7, 5, 60, seed=1)
+    matrix = dtw_distance_matrix(queries, references)
+    expected = np.array([[dtw_distance(q, r) for r in references] for q in queries])
+    np.testing.assert_allclose(matrix, expected)
+
+
+@pytest.mark.parametrize("threshold", [np.inf, 15.0])
+def test_search_matches_brute_force(threshold):
+    references = _random_sequences(12, 20, 50, seed=4)
+    candidates = [(k, PreparedSequence(seq)) for k, seq in enumerate(references)]
+    rng = np.random.default_rng(5)
+    for k in range(0, len(references), 3):
+        # Зашумлені копії еталонів і випадкові послідовності
+        queries = [
+            references[k] + 0.3 * rng.standard_normal(references[k].shape),
+            rng.standard_normal((30, 13)),
+        ]
+        for query in queries:
+            distances = [_python_dtw(query, ref) for ref in references]
+            best = int(np.argmin(distances))
+            label, distance, _ = search(query, candidates, threshold)
+            if distances[best] < threshold:
+                assert label == best
+                assert distance == pytest.approx(distances[best])
+            else:
+                assert label is None
+
+
+def test_keyword_spotting_is_independent_of_block_size():
+    rng = np.random.default_rng(6)
+    words = _random_sequences(3, 15, 30, seed=7)
+    stream = [rng.standard_normal((40, 13))]
+    for word in words * 2:
+        stream += [word + 0.1 * rng.standard_normal(word.shape)]
+        stream += [rng.standard_normal((int(rng.integers(10, 40)), 13))]
+    frames = np.concatenate(stream)
+    templates = [(f"w{k}", f"w{k}.wav", word) for k, word in enumerate(words)]
+
+    results = [
+        spot_keywords(frames, templates, block_frames=block)
+        for block in (len(frames), 64, 17, 1)
+    ]
+    assert results[0]
+
+    def key(hit):
+        return hit["word"], hit["start_frame"], hit["end_frame"]
+
+    for hits in results[1:]:
+        assert len(hits) == len(results[0])
+        for hit, expected in zip(sorted(hits, key=key), sorted(results[0], key=key)):
+            assert key(hit) == key(expected)
+            assert hit["cost"] == pytest.approx(expected["cost"])
+
+
+@pytest.mark.parametrize("columns", [1, 37, 500, 5000])
+@pytest.mark.parametrize("span", [(0.0, 10.0), (1.234, 1.3), (3.0, 7.5)])
+def test_waveform_envelope_matches_raw_samples(columns, span):
+    rng = np.random.default_rng(8)
+    audio = rng.standard_normal(10 * 8000).astype(np.float32)
+    pyramid = WaveformPyramid(audio, 8000, chunk_blocks=100)
+    times, lows, highs = pyramid.envelope(*span, columns)
+    assert 0 < len(times) <= columns
+    starts = np.round(times * 8000).astype(np.int64)
+    for start, stop, low, high in zip(starts, starts[1:], lows, highs):
+        assert low == audio[start:stop].min() and high == audio[start:stop].max()
+    # Останній стовпчик може покривати цілий блок рівня за межею відрізка
+    end = int(np.ceil(span[1] * 8000))
+    assert audio[starts[-1] :].min() <= lows[-1] <= audio[starts[-1] : end].min()
+    assert audio[starts[-1] : end].max() <= highs[-1] <= audio[starts[-1] :].max()
+
+
+def test_speech_regions_ignore_silence():
+    assert speech_regions(np.zeros(SR, dtype=np.float32), SR) == []
+    y = _speech_like()
+    regions = speech_regions(y, SR)
+    assert regions and regions[0][0] < int(0.2 * SR) < regions[0][1]
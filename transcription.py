@@ -3,6 +3,40 @@ import sys
 import whisper
 import os
 import logging
+import importlib
+import json
+import multiprocessing
+import re
+import threading
+import time
+import types
+from difflib import SequenceMatcher
+import numpy as np
+import torch
+import tqdm
+
+from audio_splitting import find_split_points, pack_regions, speech_regions
+from audio_store import load_audio
+from cancellation import CancellationToken, TranscriptionCancelled
+from instrumentation import NullTimer, StageTimer
+from model_pool import (
+    QUANTIZED_DEVICE,
+    get_pool,
+    load_whisper_model,
+    quantized_model_path,
+)
+from progress import (
+    CACHE,
+    CANCELLED,
+    DONE,
+    ERROR,
+    LANGUAGE,
+    LOADING,
+    TRANSCRIBING,
+    VAD,
+    ProgressReporter,
+)
+from result_cache import get_cache
 
 logging.basicConfig(filename="transcription.log", level=logging.INFO, encoding="utf-8")
 
@@ -13,58 +47,647 @@ def format_time(seconds):
     return f"{int(hrs):02}:{int(mins):02}:{int(secs):02}"
 
 
-def transcribe_audio(
-    file_path, model_name, language="uk", device="cpu", progress_callback=None
+def make_segment(segment):
+    return {
+        "start": segment["start"],
+        "end": segment["end"],
+        "time": f"{format_time(segment['start'])} - {format_time(segment['end'])}",
+        "text": segment["text"],
+    }
+
+
+def _check_cancelled(cancel_token):
+    # Перевірка між етапами, які не проходять через кроки моделі
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+
+
+def _install_cancel_hooks(model, cancel_token):
+    # Енкодер і кожен крок декодера перевіряють прапорець, тож зупинка
+    # спрацьовує за час одного кроку, а не цілого 30-секундного вікна.
+    # Модель спільна в пулі, тому реагуємо лише на виклики з нашого потоку.
+    owner = threading.get_ident()
+
+    def check(module, args):
+        if threading.get_ident() == owner:
+            cancel_token.raise_if_cancelled()
+
+    return [
+        model.encoder.register_forward_pre_hook(check),
+        model.decoder.register_forward_pre_hook(check),
+    ]
+
+
+def remap_segment(segment, timeline):
+    """Переводить мітки часу сегмента зі стиснутого VAD-аудіо на вихідну шкалу."""
+    if timeline is None:
+        return segment
+    return {
+        **segment,
+        "start": timeline.to_original(segment["start"], is_start=True),
+        "end": timeline.to_original(segment["end"]),
+    }
+
+
+# whisper.transcribe не має зворотних викликів, але після кожного
+# 30-секундного вікна викликає pbar.update(). Підміняємо його tqdm на
+# підклас, який у цей момент передає нові сегменти активному слухачу потоку.
+# Це залежить від внутрішніх деталей закріпленої у requirements.txt версії
+# openai-whisper==20240930: модульного імпорту tqdm і локальної змінної
+# all_segments у transcribe(). Після оновлення whisper перевірте обидва.
+_stream_listener = threading.local()
+_missing_segments_warned = False
+
+
+class _WindowProgressBar(tqdm.tqdm):
+    def update(self, n=1):
+        result = super().update(n)
+        listener = getattr(_stream_listener, "listener", None)
+        if listener is not None:
+            # Кадр, що викликав update, — це сама функція whisper.transcribe;
+            # all_segments уже містить сегменти щойно декодованого вікна
+            all_segments = sys._getframe(1).f_locals.get("all_segments")
+            if not isinstance(all_segments, list):
+                _warn_missing_segments()
+                all_segments = []  # Прогрес і зупинка працюють і без сегментів
+            listener.on_window(n, self.total, all_segments)
+        return result
+
+
+def _warn_missing_segments():
+    global _missing_segments_warned
+    if not _missing_segments_warned:
+        _missing_segments_warned = True
+        logging.warning(
+            "whisper.transcribe не має локальної all_segments: сегменти "
+            "показуватимуться лише після завершення (інша версія openai-whisper?)"
+        )
+
+
+importlib.import_module("whisper.transcribe").tqdm = types.SimpleNamespace(
+    tqdm=_WindowProgressBar
+)
+
+
+class _StreamListener:
+    def __init__(
+        self,
+        segment_callback=None,
+        position_callback=None,
+        cancel_token=None,
+        timeline=None,
+    ):
+        self.segment_callback = segment_callback
+        self.position_callback = position_callback
+        self.cancel_token = cancel_token
+        self.timeline = timeline
+        self.processed_frames = 0
+        self.segments = []
+
+    def on_window(self, frames, total_frames, all_segments):
+        self.processed_frames += frames
+        for segment in all_segments[len(self.segments) :]:
+            segment = make_segment(remap_segment(segment, self.timeline))
+            self.segments.append(segment)
+            if self.segment_callback:
+                self.segment_callback(segment)
+        if self.position_callback and total_frames:
+            frame_seconds = whisper.audio.HOP_LENGTH / whisper.audio.SAMPLE_RATE
+            self.position_callback(
+                min(self.processed_frames, total_frames) * frame_seconds,
+                total_frames * frame_seconds,
+            )
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+
+
+def language_probe_windows(audio, n_windows=3):
+    """Перше 30-секундне вікно та ще n_windows - 1 рівномірно розподілених по файлу."""
+    window = whisper.audio.N_SAMPLES
+    last_start = max(0, len(audio) - window)
+    starts = sorted({int(s) for s in np.linspace(0, last_start, max(1, n_windows))})
+    return [whisper.pad_or_trim(audio[start : start + window]) for start in starts]
+
+
+def detect_language(model, audio, n_windows=3):
+    """Визначає мову за кількома 30-секундними вікнами замість усього файлу.
+
+    Ймовірності мов усереднюються по вікнах. Повертає (мова, ймовірність).
+    """
+    return vote_language(model, language_probe_windows(audio, n_windows))
+
+
+def vote_language(model, windows):
+    mels = [whisper.log_mel_spectrogram(window, model.dims.n_mels) for window in windows]
+    # Усі вікна проходять через енкодер одним батчем
+    _, probs = model.detect_language(torch.stack(mels).to(model.device))
+
+    votes = {}
+    for window_probs in probs:
+        for lang, prob in window_probs.items():
+            votes[lang] = votes.get(lang, 0.0) + prob / len(probs)
+    language = max(votes, key=votes.get)
+    return language, votes[language]
+
+
+def _timed_transcribe(model, audio, language):
+    started = time.perf_counter()
+    result = model.transcribe(
+        audio, language=language, fp16=False, condition_on_previous_text=False
+    )
+    return result["text"], time.perf_counter() - started
+
+
+def _compare_speed(float_model, quantized_model, audio, language, runs=3):
+    # Перший виклик кожної моделі не вимірюється: він платить за прогрів
+    # алокатора та ядер. Далі порядок чергується, береться медіана
+    _timed_transcribe(float_model, audio, language)
+    _timed_transcribe(quantized_model, audio, language)
+    float_times, int8_times = [], []
+    for run in range(runs):
+        order = [(float_model, float_times), (quantized_model, int8_times)]
+        for model, times in order if run % 2 == 0 else order[::-1]:
+            text, seconds = _timed_transcribe(model, audio, language)
+            times.append((seconds, text))
+    float_time, float_text = sorted(float_times)[runs // 2]
+    int8_time, int8_text = sorted(int8_times)[runs // 2]
+    return float_text, float_time, int8_text, int8_time
+
+
+def report_int8_calibration(
+    model_name, quantized_model, audio, language, cancel_token=None
 ):
+    """Порівнює int8 і fp32 версії моделі на першому вікні аудіо.
+
+    Вимірювання виконується один раз для кожної моделі, результат
+    зберігається поруч із квантизованими вагами і щоразу пишеться в лог.
+    Обидві моделі спершу прогріваються, час — медіана кількох запусків.
+    """
+    report_path = os.path.splitext(quantized_model_path(model_name))[0] + ".json"
+    if os.path.exists(report_path):
+        with open(report_path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+    else:
+        sample = audio[: whisper.audio.N_SAMPLES]
+        pool = get_pool()
+        was_loaded = pool.is_loaded(model_name, "cpu")
+        with pool.use_model(model_name, "cpu") as float_model:
+            hooks = (
+                _install_cancel_hooks(float_model, cancel_token) if cancel_token else []
+            )
+            try:
+                # Квантизована модель уже має перехоплювачі зупинки від виклику
+                _check_cancelled(cancel_token)
+                float_text, float_time, int8_text, int8_time = _compare_speed(
+                    float_model, quantized_model, sample, language
+                )
+            finally:
+                for hook in hooks:
+                    hook.remove()
+        if not was_loaded:
+            pool.unload(model_name, "cpu")
+
+        float_words = float_text.lower().split()
+        int8_words = int8_text.lower().split()
+        report = {
+            "model": model_name,
+            "fp32_seconds": round(float_time, 3),
+            "int8_seconds": round(int8_time, 3),
+            "speedup": round(float_time / max(int8_time, 1e-6), 2),
+            "word_difference": round(
+                1.0 - SequenceMatcher(None, float_words, int8_words).ratio(), 4
+            ),
+            "fp32_text": float_text,
+            "int8_text": int8_text,
+        }
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    logging.info(
+        f"int8-модель {model_name}: прискорення x{report['speedup']}, "
+        f"розбіжність слів з fp32 {report['word_difference']:.1%}"
+    )
+    return report
+
+
+# Модель процесу-виконавця паралельного транскрибування або помилка її
+# завантаження
+_worker_model = None
+_worker_error = None
+
+
+def _init_parallel_worker(model_name, device, threads):
+    global _worker_model, _worker_error
+    # Обмежуємо потоки torch, щоб N процесів не змагалися за ті самі ядра
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    # Виняток в initializer змушує Pool без кінця перезапускати процеси,
+    # тому помилка зберігається і повертається з першого ж завдання
     try:
-        os.environ["WHISPER_MODELS_DIR"] = os.path.abspath("models")
-        if progress_callback:
-            progress_callback("Завантаження моделі розпізнавання аудіо..")
-        model = whisper.load_model(
-            model_name, device=device, download_root=os.environ["WHISPER_MODELS_DIR"]
+        _worker_model = load_whisper_model(model_name, device)
+    except Exception as e:
+        _worker_error = e
+
+
+def _get_worker_model():
+    if _worker_model is None:
+        raise _worker_error
+    return _worker_model
+
+
+def _detect_language_in_worker(windows):
+    return vote_language(_get_worker_model(), windows)
+
+
+def _transcribe_chunk(task):
+    index, audio, offset, language, fp16 = task
+    result = _get_worker_model().transcribe(audio, language=language, fp16=fp16)
+    return index, [
+        {
+            "start": segment["start"] + offset,
+            "end": segment["end"] + offset,
+            "text": segment["text"],
+        }
+        for segment in result["segments"]
+    ]
+
+
+class _NextResult:
+    """Адаптер, щоб чекати наступний результат imap так само, як AsyncResult."""
+
+    def __init__(self, iterator):
+        self.iterator = iterator
+
+    def get(self, timeout):
+        return self.iterator.next(timeout)
+
+
+def _wait_result(async_result, cancel_token, poll=0.1):
+    while True:
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        try:
+            return async_result.get(timeout=poll)
+        except multiprocessing.TimeoutError:
+            continue
+
+
+def _trim_boundary_overlap(prev_text, next_text, max_words=8):
+    """Прибирає з початку next_text слова, що повторюють кінець prev_text.
+
+    Повертає None, якщо наступний сегмент повністю дублює попередній.
+    """
+    prev_words = re.findall(r"\w+", prev_text.lower())
+    next_matches = list(re.finditer(r"\w+", next_text))
+    next_words = [match.group().lower() for match in next_matches]
+    if not next_words:
+        return next_text
+    for n in range(min(max_words, len(prev_words), len(next_words)), 0, -1):
+        if prev_words[-n:] != next_words[:n]:
+            continue
+        if n == len(next_words):
+            return None
+        # Одне спільне слово може бути збігом, а не повтором
+        if n < 2:
+            break
+        rest = next_text[next_matches[n - 1].end() :].lstrip(" ,.;:!?-")
+        return f" {rest}"
+    return next_text
+
+
+def transcribe_parallel(
+    audio,
+    model_name,
+    language,
+    device,
+    workers,
+    reporter=None,
+    segment_callback=None,
+    cancel_token=None,
+    timeline=None,
+    timer=None,
+):
+    """Ділить аудіо по паузах і транскрибує шматки в пулі з workers процесів.
+
+    Кожен процес завантажує власну копію моделі. Сегменти отримують глобальні
+    мітки часу і видаються по порядку, щойно готові всі попередні шматки.
+    Повертає (сегменти, мова); після зупинки — сегменти, отримані до неї.
+    """
+    sr = whisper.audio.SAMPLE_RATE
+    total_seconds = len(audio) / sr
+    # Шматки коротші за хвилину не окупають накладних витрат на вікна Whisper
+    chunk_length = max(60.0, total_seconds / (workers * 2))
+    points = find_split_points(audio, sr, chunk_length)
+    bounds = list(zip([0] + points, points + [len(audio)]))
+    if len(bounds) == 1:
+        # Один шматок не варто вантажити в окремий процес з новою моделлю;
+        # мова при цьому повертається такою, як її передали
+        segments = _transcribe_sequential(
+            audio,
+            model_name,
+            language,
+            device,
+            reporter,
+            segment_callback,
+            cancel_token,
+            timeline,
+            timer,
         )
+        return segments, language
+    workers = min(workers, len(bounds))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    fp16 = str(device).startswith("cuda")
+    reporter = reporter or ProgressReporter()
+    # Без таймера від transcribe_audio етапи не вимірюються: запуск нікому
+    # завершити, а фоновий замір пам'яті працював би до кінця процесу
+    timer = timer or NullTimer()
 
+    # Моделі завантажуються в процесах паралельно з визначенням мови
+    timer.start("model_load")
+    reporter.stage(
+        LOADING, f"Завантаження моделі розпізнавання аудіо у {workers} процесах.."
+    )
+    processes = multiprocessing.Pool(
+        workers, initializer=_init_parallel_worker, initargs=(model_name, device, threads)
+    )
+    transcription = []
+    try:
         if language == "auto":
-            if progress_callback:
-                progress_callback("Автоматичне розпізнавання мови..")
-            result = model.transcribe(file_path, task="detect-language")
-            language = result["language"]
-            if progress_callback:
-                progress_callback(f"Виявлена мова: {language}")
-
-        if progress_callback:
-            progress_callback("Транскрибування аудіо..")
-        result = model.transcribe(file_path, language=language, fp16=True)
-
-        transcription = []
-        for segment in result["segments"]:
-            transcription.append(
-                {
-                    "start": segment["start"],
-                    "end": segment["end"],
-                    "time": f"{format_time(segment['start'])} - {format_time(segment['end'])}",
-                    "text": segment["text"],
-                }
+            timer.start("language")
+            reporter.stage(LANGUAGE, "Автоматичне розпізнавання мови..")
+            language, confidence = _wait_result(
+                processes.apply_async(
+                    _detect_language_in_worker, (language_probe_windows(audio),)
+                ),
+                cancel_token,
+            )
+            logging.info(f"Виявлена мова: {language} ({confidence:.2f})")
+            reporter.stage(
+                LANGUAGE, f"Виявлена мова: {language} (ймовірність {confidence:.0%})"
+            )
+
+        timer.start("inference")
+        reporter.stage(
+            TRANSCRIBING, f"Транскрибування аудіо ({len(bounds)} частин).."
+        )
+        tasks = [
+            (index, audio[start:end], start / sr, language, fp16)
+            for index, (start, end) in enumerate(bounds)
+        ]
+        results = processes.imap_unordered(_transcribe_chunk, tasks)
+
+        chunks = [None] * len(bounds)
+        next_chunk = 0
+        processed = 0.0
+        for _ in range(len(tasks)):
+            index, segments = _wait_result(_NextResult(results), cancel_token)
+            chunks[index] = segments
+            processed += (bounds[index][1] - bounds[index][0]) / sr
+            reporter.position(processed, total_seconds)
+
+            while next_chunk < len(chunks) and chunks[next_chunk] is not None:
+                for position, segment in enumerate(chunks[next_chunk]):
+                    if position == 0 and transcription:
+                        text = _trim_boundary_overlap(
+                            transcription[-1]["text"], segment["text"]
+                        )
+                        if text is None:
+                            continue
+                        segment["text"] = text
+                    segment = make_segment(remap_segment(segment, timeline))
+                    transcription.append(segment)
+                    if segment_callback:
+                        segment_callback(segment)
+                chunks[next_chunk] = []
+                next_chunk += 1
+        processes.close()
+    except TranscriptionCancelled:
+        # Окремі процеси можна безпечно завершити примусово
+        processes.terminate()
+        logging.info("Паралельне транскрибування перервано користувачем")
+    except BaseException:
+        processes.terminate()
+        raise
+    finally:
+        processes.join()
+    return transcription, language
+
+
+def _transcribe_sequential(
+    audio,
+    model_name,
+    language,
+    device,
+    reporter=None,
+    segment_callback=None,
+    cancel_token=None,
+    timeline=None,
+    timer=None,
+):
+    reporter = reporter or ProgressReporter()
+    timer = timer or NullTimer()
+    pool = get_pool()
+    timer.start("model_load")
+    if pool.is_loaded(model_name, device):
+        reporter.stage(LOADING, "Модель розпізнавання аудіо вже завантажена")
+    else:
+        reporter.stage(LOADING, "Завантаження моделі розпізнавання аудіо..")
+
+    # Модель береться з пулу і залишається в пам'яті для наступних запусків
+    listener = None
+    with pool.use_model(model_name, device) as model:
+        # Перехоплювачі діють і під час визначення мови та калібрування int8
+        hooks = _install_cancel_hooks(model, cancel_token) if cancel_token else []
+        try:
+            _check_cancelled(cancel_token)
+            if language == "auto":
+                timer.start("language")
+                reporter.stage(LANGUAGE, "Автоматичне розпізнавання мови..")
+                language, confidence = detect_language(model, audio)
+                logging.info(f"Виявлена мова: {language} ({confidence:.2f})")
+                reporter.stage(
+                    LANGUAGE,
+                    f"Виявлена мова: {language} (ймовірність {confidence:.0%})",
+                )
+
+            if device == QUANTIZED_DEVICE:
+                timer.start("int8_calibration")
+                report_int8_calibration(
+                    model_name, model, audio, language, cancel_token
+                )
+
+            timer.start("inference")
+            reporter.stage(TRANSCRIBING, "Транскрибування аудіо..")
+            listener = _StreamListener(
+                segment_callback, reporter.position, cancel_token, timeline
+            )
+            _stream_listener.listener = listener
+            _check_cancelled(cancel_token)
+            # На CPU Whisper однаково переходить на fp32, тож fp16 лише для CUDA
+            result = model.transcribe(
+                audio, language=language, fp16=str(device).startswith("cuda")
+            )
+        except TranscriptionCancelled:
+            logging.info("Транскрибування перервано користувачем")
+            if str(device).startswith("cuda"):
+                torch.cuda.empty_cache()
+            return listener.segments if listener else []
+        finally:
+            _stream_listener.listener = None
+            for hook in hooks:
+                hook.remove()
+
+    return [
+        make_segment(remap_segment(segment, timeline))
+        for segment in result["segments"]
+    ]
+
+
+def _apply_vad(audio, reporter):
+    sr = whisper.audio.SAMPLE_RATE
+    regions = speech_regions(audio, sr)
+    packed, timeline = pack_regions(audio, regions, sr)
+    kept = len(packed) / max(1, len(audio))
+    logging.info(
+        f"VAD: {len(regions)} ділянок мовлення, до декодера йде {kept:.0%} аудіо"
+    )
+    reporter.stage(VAD, f"Виявлено мовлення: {kept:.0%} тривалості файлу")
+    return packed, timeline
+
+
+def transcribe_audio(
+    file_path,
+    model_name,
+    language="uk",
+    device="cpu",
+    progress_callback=None,
+    segment_callback=None,
+    event_callback=None,
+    workers=1,
+    use_cache=True,
+    cancel_token=None,
+    vad=False,
+):
+    """Транскрибує файл моделлю Whisper.
+
+    progress_callback(message) отримує текст кожного етапу,
+    event_callback(event) — ті самі етапи й позицію декодера як словники
+    progress.ProgressReporter з відсотком, RTF та оцінкою часу до
+    завершення. segment_callback(segment) отримує сегменти одразу після
+    декодування кожного вікна. За workers > 1 довгий файл ділиться по паузах і
+    транскрибується паралельно в кількох процесах. Готові результати
+    зберігаються в кеші та повторно не обчислюються. Після
+    cancel_token.cancel() повертаються сегменти, отримані до зупинки.
+    За vad=True модель декодує лише ділянки мовлення, склеєні разом, а мітки
+    часу переводяться назад на шкалу вихідного файлу.
+    """
+    reporter = ProgressReporter(progress_callback, event_callback)
+    # Час етапів запуску записується в журнал instrumentation.RUNS_LOG
+    timer = StageTimer(
+        "whisper",
+        file=file_path,
+        model=model_name,
+        language=language,
+        device=device,
+        workers=workers,
+        vad=vad,
+    )
+    try:
+        cache = get_cache() if use_cache else None
+        if cache is not None:
+            timer.start("cache")
+            reporter.stage(CACHE, "Перевірка кешу результатів..")
+            cache_key = cache.key(
+                file_path,
+                model_name,
+                language,
+                device,
+                {"workers": workers, "vad": vad},
+            )
+            cached = cache.get(cache_key)
+            if cached is not None:
+                logging.info(f"Результат для {file_path} взято з кешу")
+                if segment_callback:
+                    for segment in cached:
+                        segment_callback(segment)
+                reporter.stage(DONE, "Завершено (результат з кешу)")
+                timer.finish("cached")
+                return cached
+
+        # Аудіо декодується один раз і використовується для всіх етапів
+        _check_cancelled(cancel_token)
+        timer.start("decode")
+        audio = load_audio(file_path, whisper.audio.SAMPLE_RATE)[0]
+        timer.context["audio_seconds"] = round(
+            len(audio) / whisper.audio.SAMPLE_RATE, 2
+        )
+        timeline = None
+        if vad:
+            _check_cancelled(cancel_token)
+            timer.start("vad")
+            audio, timeline = _apply_vad(audio, reporter)
+        _check_cancelled(cancel_token)
+
+        if timeline is not None and not len(audio):
+            # VAD не знайшов мовлення: декодувати нічого
+            transcription = []
+        elif workers > 1:
+            transcription, _ = transcribe_parallel(
+                audio,
+                model_name,
+                language,
+                device,
+                workers,
+                reporter,
+                segment_callback,
+                cancel_token,
+                timeline,
+                timer,
             )
+        else:
+            transcription = _transcribe_sequential(
+                audio,
+                model_name,
+                language,
+                device,
+                reporter,
+                segment_callback,
+                cancel_token,
+                timeline,
+                timer,
+            )
+
+        if cancel_token is not None and cancel_token.cancelled:
+            # Неповний результат не кешується
+            reporter.stage(CANCELLED, "Перервано")
+            timer.finish("cancelled", segments=len(transcription))
+            return transcription
 
-        if progress_callback:
-            progress_callback("Завершено")
+        if cache is not None:
+            timer.start("cache_store")
+            # Готовий результат важливіший за кеш: збій запису лише логуємо
+            try:
+                cache.put(cache_key, transcription)
+            except Exception as e:
+                logging.warning(f"Не вдалося зберегти результат у кеш: {e}")
+        timer.finish(segments=len(transcription))
+        reporter.stage(DONE, "Завершено")
         return transcription
+    except TranscriptionCancelled:
+        # Зупинка до початку декодування: сегментів ще немає
+        logging.info("Транскрибування перервано користувачем")
+        reporter.stage(CANCELLED, "Перервано")
+        timer.finish("cancelled", segments=0)
+        return []
     except Exception as e:
-        if progress_callback:
-            progress_callback(f"Помилка: {str(e)}")
+        timer.finish("error", error=str(e))
+        reporter.stage(ERROR, f"Помилка: {str(e)}")
         return {"error": str(e)}
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 5:
-        # print(json.dumps({"error": "Помилка: Не передано всі необхідні параметри."}), flush=True)
-        sys.exit(1)
-
-    audio_file_path = sys.argv[1]
-    model_name = sys.argv[2]
-    language = sys.argv[3]
-    device = sys.argv[4]
+    # Пакетний режим без GUI: python transcription.py ШЛЯХИ... [--model ...]
+    from batch_transcription import main
 
-    transcription = transcribe_audio(audio_file_path, model_name, language, device)
-    # print(json.dumps(transcription), flush=True)
+    multiprocessing.freeze_support()
+    sys.exit(main())
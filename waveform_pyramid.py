@@ -0,0 +1,110 @@
+# waveform_pyramid.py
+import numpy as np
+
+
+class WaveformPyramid:
+    """Багаторівнева обвідна (мінімум/максимум) сигналу для малювання хвилі.
+
+    Рівень 0 зберігає мінімум і максимум кожних base_block відліків, кожен
+    наступний рівень — у factor разів грубший. Для будь-якого видимого
+    відрізка береться рівень, блок якого не більший за кількість відліків
+    на стовпчик екрана, тож малюється лише близько стількох точок, скільки
+    на полотні пікселів, а сирі відліки читаються тільки при сильному
+    збільшенні.
+    """
+
+    def __init__(
+        self, audio, sample_rate, base_block=64, factor=4, chunk_blocks=1 << 16
+    ):
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.base_block = base_block
+        self.factor = factor
+        self.levels = []  # (розмір блоку у відліках, мінімуми, максимуми)
+
+        n_blocks = -(-len(audio) // base_block)
+        lows = np.empty(n_blocks, dtype=np.float32)
+        highs = np.empty(n_blocks, dtype=np.float32)
+        # Частинами, щоб не створювати копій усього сигналу (він може бути memmap)
+        step = chunk_blocks * base_block
+        for first in range(0, len(audio), step):
+            chunk = np.asarray(audio[first : first + step], dtype=np.float32)
+            full = len(chunk) // base_block
+            b = first // base_block
+            blocks = chunk[: full * base_block].reshape(full, base_block)
+            lows[b : b + full] = blocks.min(axis=1)
+            highs[b : b + full] = blocks.max(axis=1)
+            if full * base_block < len(chunk):
+                lows[b + full] = chunk[full * base_block :].min()
+                highs[b + full] = chunk[full * base_block :].max()
+        block = base_block
+        self.levels.append((block, lows, highs))
+        while len(lows) > 1:
+            # Повторення останнього блоку не змінює мінімум і максимум
+            pad = -len(lows) % factor
+            lows = np.pad(lows, (0, pad), mode="edge")
+            highs = np.pad(highs, (0, pad), mode="edge")
+            lows = lows.reshape(-1, factor).min(axis=1)
+            highs = highs.reshape(-1, factor).max(axis=1)
+            block *= factor
+            self.levels.append((block, lows, highs))
+
+    @property
+    def duration(self):
+        return len(self.audio) / self.sample_rate
+
+    def amplitude_range(self):
+        _, lows, highs = self.levels[-1]
+        if len(lows) == 0:
+            return 0.0, 0.0
+        return float(lows[0]), float(highs[0])
+
+    def envelope(self, start_time, end_time, columns):
+        """Обвідна відрізка [start_time, end_time] (с) приблизно в columns стовпчиків.
+
+        Повертає (час початку стовпчика, мінімуми, максимуми). Якщо відліків
+        менше, ніж стовпчиків, повертаються самі відліки (мінімум = максимум).
+        """
+        n = len(self.audio)
+        start = int(np.clip(np.floor(start_time * self.sample_rate), 0, n))
+        end = int(np.clip(np.ceil(end_time * self.sample_rate), 0, n))
+        columns = max(1, int(columns))
+        if end <= start:
+            empty = np.zeros(0, dtype=np.float32)
+            return empty, empty, empty
+        per_column = (end - start) / columns
+        if per_column <= 1:
+            samples = np.asarray(self.audio[start:end], dtype=np.float32)
+            return np.arange(start, end) / self.sample_rate, samples, samples
+
+        if per_column < self.base_block:
+            # Дрібніше за рівень 0 — мінімуми й максимуми прямо з відліків
+            block = 1
+            lows = highs = np.asarray(self.audio[start:end], dtype=np.float32)
+            first = start
+        else:
+            # Найгрубший рівень, блок якого ще не ширший за стовпчик
+            level = 0
+            while (
+                level + 1 < len(self.levels)
+                and self.levels[level + 1][0] <= per_column
+            ):
+                level += 1
+            block, lows, highs = self.levels[level]
+            first = start // block
+            last = -(-end // block)
+            lows, highs = lows[first:last], highs[first:last]
+
+        edges = np.linspace(0, len(lows), columns + 1).astype(np.int64)[:-1]
+        edges = np.unique(edges)
+        times = (first + edges) * block / self.sample_rate
+        return (
+            times,
+            np.minimum.reduceat(lows, edges),
+            np.maximum.reduceat(highs, edges),
+        )
+
+    def polyline(self, start_time, end_time, columns):
+        """Точки однієї лінії, що зигзагом мін/макс заповнює обвідну."""
+        times, lows, highs = self.envelope(start_time, end_time, columns)
+        return np.repeat(times, 2), np.column_stack([lows, highs]).ravel()